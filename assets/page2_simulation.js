@@ -0,0 +1,201 @@
+// In-browser version of simulation/engine.py for page2's "in the browser" mode.
+//
+// The server only sends the parameters and a seed (client-sim-page2), the
+// agents are stepped here on every tick of interval-page2-client and drawn
+// into the figures the server set up. Same model as update_simulation, but
+// with its own seeded generator, so runs match the Python engine statistically
+// rather than step for step (see simulation/check_clientside.py).
+(function () {
+    var HEALTHY = 0, INFECTED = 1, RECOVERED = 2, VACCINATED = 3;
+
+    // history points kept for the time series, pairs are merged when it fills up
+    var maxPoints = 2000;
+
+    // small seeded generator (mulberry32), returns floats in [0, 1)
+    function makeRng(seed) {
+        var a = seed >>> 0;
+        return function () {
+            a = (a + 0x6D2B79F5) >>> 0;
+            var t = a;
+            t = Math.imul(t ^ (t >>> 15), t | 1);
+            t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+            return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+        };
+    }
+
+    function initSimulation(params) {
+        var n = params.num_people;
+        var rng = makeRng(params.seed);
+        var sim = {
+            params: params,
+            rng: rng,
+            x: new Float32Array(n),
+            y: new Float32Array(n),
+            vx: new Float32Array(n),
+            vy: new Float32Array(n),
+            state: new Uint8Array(n),
+            timeInfected: new Int32Array(n),
+            step: 0,
+            history: {step: [], infected: [], recovered: [], vaccinated: []}
+        };
+        for (var i = 0; i < n; i++) {
+            sim.x[i] = rng() * params.width;
+            sim.y[i] = rng() * params.height;
+            sim.vx[i] = rng() * 2 - 1;
+            sim.vy[i] = rng() * 2 - 1;
+        }
+
+        // the first vaccination_percentage% are vaccinated, the next one is infected
+        var vaccinated = Math.floor(n * params.vaccination_percentage / 100);
+        for (var j = 0; j < vaccinated; j++) {
+            sim.state[j] = VACCINATED;
+        }
+        if (vaccinated < n) {
+            sim.state[vaccinated] = INFECTED;
+        }
+        return sim;
+    }
+
+    // one tick: move, bounce, recover, then infect healthy people within the
+    // radius of someone infected, each contact with probability R0 / 10
+    function stepSimulation(sim, R0) {
+        var p = sim.params, n = sim.state.length;
+        var x = sim.x, y = sim.y, vx = sim.vx, vy = sim.vy, state = sim.state;
+        var i;
+
+        for (i = 0; i < n; i++) {
+            x[i] += vx[i] * p.speed;
+            y[i] += vy[i] * p.speed;
+            if (x[i] < 0 || x[i] > p.width) vx[i] = -vx[i];
+            if (y[i] < 0 || y[i] > p.height) vy[i] = -vy[i];
+            if (state[i] === INFECTED) {
+                sim.timeInfected[i] += 1;
+                if (sim.timeInfected[i] > p.duration) state[i] = RECOVERED;
+            }
+        }
+
+        // healthy people bucketed into radius-sized cells
+        var radius = p.infection_radius;
+        var cellsX = Math.floor(p.width / radius) + 1, cellsY = Math.floor(p.height / radius) + 1;
+        function cellOf(value, cells) {
+            return Math.min(Math.max(Math.floor(value / radius), 0), cells - 1);
+        }
+        var cells = new Map();
+        for (i = 0; i < n; i++) {
+            if (state[i] !== HEALTHY) continue;
+            var key = cellOf(x[i], cellsX) * cellsY + cellOf(y[i], cellsY);
+            if (!cells.has(key)) cells.set(key, []);
+            cells.get(key).push(i);
+        }
+
+        var newlyInfected = [];
+        for (i = 0; i < n; i++) {
+            if (state[i] !== INFECTED) continue;
+            var cx = cellOf(x[i], cellsX), cy = cellOf(y[i], cellsY);
+            for (var dx = -1; dx <= 1; dx++) {
+                for (var dy = -1; dy <= 1; dy++) {
+                    var nx = cx + dx, ny = cy + dy;
+                    if (nx < 0 || nx >= cellsX || ny < 0 || ny >= cellsY) continue;
+                    var targets = cells.get(nx * cellsY + ny);
+                    if (!targets) continue;
+                    for (var k = 0; k < targets.length; k++) {
+                        var t = targets[k];
+                        var ddx = x[i] - x[t], ddy = y[i] - y[t];
+                        if (ddx * ddx + ddy * ddy < radius * radius && sim.rng() < R0 / 10) {
+                            newlyInfected.push(t);
+                        }
+                    }
+                }
+            }
+        }
+        for (i = 0; i < newlyInfected.length; i++) {
+            state[newlyInfected[i]] = INFECTED;
+        }
+
+        var counts = countStates(sim);
+        addHistory(sim.history, sim.step, counts);
+        sim.step += 1;
+        return counts;
+    }
+
+    function countStates(sim) {
+        var counts = [0, 0, 0, 0];
+        for (var i = 0; i < sim.state.length; i++) counts[sim.state[i]] += 1;
+        return {healthy: counts[HEALTHY], infected: counts[INFECTED], recovered: counts[RECOVERED], vaccinated: counts[VACCINATED]};
+    }
+
+    // when the history is full every pair of points becomes the one with more
+    // infected, so the peak survives (recovered/vaccinated only go up)
+    function addHistory(history, step, counts) {
+        if (history.step.length >= maxPoints) {
+            var keep = [];
+            for (var i = 0; i + 1 < history.step.length; i += 2) {
+                keep.push(history.infected[i + 1] > history.infected[i] ? i + 1 : i);
+            }
+            ['step', 'infected', 'recovered', 'vaccinated'].forEach(function (name) {
+                history[name] = keep.map(function (j) { return history[name][j]; });
+            });
+        }
+        history.step.push(step);
+        history.infected.push(counts.infected);
+        history.recovered.push(counts.recovered);
+        history.vaccinated.push(counts.vaccinated);
+    }
+
+    var engine = {
+        initSimulation: initSimulation,
+        stepSimulation: stepSimulation,
+        countStates: countStates
+    };
+
+    // node, for the parity check
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = engine;
+    }
+
+    if (typeof window === 'undefined') return;
+
+    var sim = null;
+    // trace order of create_figure in pages/page2.py
+    var traceStates = [VACCINATED, INFECTED, RECOVERED, HEALTHY];
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.page2 = {
+        step: function (n_intervals, r0, params, figure, timeSeries) {
+            if (!params || !figure || !timeSeries) {
+                return window.dash_clientside.no_update;
+            }
+            // a new run id comes with every restart or change of settings
+            if (!sim || sim.params.run_id !== params.run_id) {
+                sim = initSimulation(params);
+            }
+            var counts = stepSimulation(sim, r0);
+
+            var data = figure.data.map(function (trace, j) {
+                var xs = [], ys = [];
+                for (var i = 0; i < sim.state.length; i++) {
+                    if (sim.state[i] === traceStates[j]) {
+                        xs.push(sim.x[i]);
+                        ys.push(sim.y[i]);
+                    }
+                }
+                return Object.assign({}, trace, {x: xs, y: ys});
+            });
+            var title = 'R0 = ' + r0.toFixed(1) + ', Population = ' + sim.state.length;
+            var layout = Object.assign({}, figure.layout, {title: Object.assign({}, figure.layout.title, {text: title})});
+
+            var h = sim.history;
+            var seriesData = timeSeries.data.map(function (trace, j) {
+                return Object.assign({}, trace, {x: h.step, y: h[['infected', 'recovered', 'vaccinated'][j]]});
+            });
+
+            return [
+                Object.assign({}, figure, {data: data, layout: layout}),
+                'Infected: ' + counts.infected + ', Recovered: ' + counts.recovered + ', Vaccinated: ' + counts.vaccinated +
+                    ', Seed: ' + sim.params.seed,
+                Object.assign({}, timeSeries, {data: seriesData}),
+                counts.infected === 0
+            ];
+        }
+    };
+})();
@@ -0,0 +1,64 @@
+// Browser-side playback for page3.
+//
+// The whole date x country measures matrix comes down once into the
+// measures-page3 store (see measures_payload in pages/page3.py): uint16 values
+// scaled between lo and hi, base64 encoded, with 65535 for "no record". Moving
+// the slider or playing then restyles the map here without asking the server.
+// Without the matrix (or in server mode) the slider index is handed to the
+// server's update_map instead.
+(function () {
+    var MISSING = 65535;
+    var decoded = null;
+
+    // decode the matrix once per payload
+    function matrix(store) {
+        if (decoded && decoded.store === store) return decoded;
+        var bytes = atob(store.values);
+        var buffer = new Uint8Array(bytes.length);
+        for (var i = 0; i < bytes.length; i++) buffer[i] = bytes.charCodeAt(i);
+        decoded = {store: store, values: new Uint16Array(buffer.buffer)};
+        return decoded;
+    }
+
+    // locations and values for one date, like map_frame on the server
+    function frame(store, index) {
+        var values = matrix(store).values;
+        var width = store.countries.length;
+        var scale = (store.hi - store.lo) / (MISSING - 1);
+        var locations = [], z = [];
+        for (var j = 0; j < width; j++) {
+            var value = values[index * width + j];
+            if (value === MISSING) continue;
+            locations.push(store.countries[j]);
+            z.push(Math.round((store.lo + value * scale) * 10000) / 10000);
+        }
+        return {locations: locations, z: z};
+    }
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.page3 = {
+        // returns [figure, server request]: one of the two is no_update
+        route: function (index, mode, store, figure) {
+            var no_update = window.dash_clientside.no_update;
+            if (mode !== 'browser' || !store || !figure) {
+                return [no_update, index];
+            }
+            var data = frame(store, index);
+            var trace = Object.assign({}, figure.data[0], {locations: data.locations, hovertext: data.locations, z: data.z});
+            // same wording as map_title in maps/measures.py
+            var title = Object.assign({}, figure.layout.title, {text: 'Level of COVID-19 measures, circa ' + store.dates[index]});
+            return [
+                Object.assign({}, figure, {
+                    data: [trace].concat(figure.data.slice(1)),
+                    layout: Object.assign({}, figure.layout, {title: title})
+                }),
+                no_update
+            ];
+        },
+
+        // next slider position for a playback tick, looping at the end
+        advance: function (n_intervals, index, max) {
+            return index >= max ? 0 : index + 1;
+        }
+    };
+})();
@@ -0,0 +1,32 @@
+// Shared scheduling for the pages' dcc.Interval components.
+//
+// Pages don't set an interval's `disabled` directly. A clientside callback
+// passes whether the page wants it ticking (playing, simulation still
+// changing) through window.tickScheduler.gate(id, wanted) instead. Wanted
+// intervals only run while the tab is visible: hiding the tab stops them and
+// showing it again starts them back up, so background tabs send no requests.
+(function () {
+    // interval id -> {wanted, path}, path is the page the interval was on
+    var intervals = {};
+
+    function disabled(wanted) {
+        return !(wanted && !document.hidden);
+    }
+
+    window.tickScheduler = {
+        // returns the value for the interval's `disabled` prop
+        gate: function (id, wanted) {
+            intervals[id] = {wanted: !!wanted, path: window.location.pathname};
+            return disabled(wanted);
+        }
+    };
+
+    document.addEventListener('visibilitychange', function () {
+        Object.keys(intervals).forEach(function (id) {
+            var entry = intervals[id];
+            // only touch intervals on the page being shown, the others aren't in the layout
+            if (!entry.wanted || entry.path !== window.location.pathname) return;
+            window.dash_clientside.set_props(id, {disabled: disabled(true)});
+        });
+    });
+})();
@@ -0,0 +1,108 @@
+# Benchmark for the date-gap filling step in preProcessing/demoprocess.py
+#
+# Compares the old per-country loop against fill_date_gaps on synthetic data at
+# 1x, 10x and 100x the current row count (~140k rows after filling).
+# Run from the repo root with: python benchmarks/bench_demoprocess.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'preProcessing'))
+from demoprocess import fill_date_gaps
+
+START_DATE = '2020-12-13'
+END_DATE = '2022-09-13'  # 640 days, so 1x (220 keys) comes out at ~140k rows
+BASE_KEYS = 220
+
+
+# build a fake vaccinations + population frame with gaps in the dates
+def make_data(num_keys, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START_DATE, END_DATE, freq='D')
+    keys = np.array([f'K{i:06d}' for i in range(num_keys)])
+
+    keep = rng.random((num_keys, len(dates))) < 0.6
+    key_idx, date_idx = np.nonzero(keep)
+    rate = rng.integers(100, 5000, num_keys)
+    start = rng.integers(0, 200, num_keys)
+    cumulative = np.maximum(0, date_idx - start[key_idx]) * rate[key_idx]
+
+    return pd.DataFrame({
+        'location_key': keys[key_idx],
+        'date': dates[date_idx],
+        'cumulative_persons_fully_vaccinated': cumulative.astype(float),
+        'population': rng.integers(100_000, 300_000_000, num_keys)[key_idx].astype(float),
+    })
+
+
+# the original per-country loop from demoprocess.py, kept here as the reference
+def fill_date_gaps_loop(combined, start_date):
+    all_dates = pd.date_range(start=start_date, end=combined['date'].max(), freq='D')
+    complete_dates = pd.DataFrame({'date': all_dates})
+
+    countries = combined['location_key'].unique()
+    combined_full = pd.DataFrame()
+
+    for country in countries:
+        country_data = combined[combined['location_key'] == country]
+        country_dates = complete_dates.copy()
+        country_dates['location_key'] = country
+        country_data = pd.merge(
+            country_dates,
+            country_data[['location_key', 'date', 'cumulative_persons_fully_vaccinated', 'population']],
+            on=['location_key', 'date'],
+            how='left'
+        )
+
+        country_data['cumulative_persons_fully_vaccinated'] = country_data['cumulative_persons_fully_vaccinated'].ffill().bfill()
+        country_data['population'] = country_data['population'].ffill().bfill()
+
+        country_data['percent_vaccinated'] = (
+            country_data['cumulative_persons_fully_vaccinated'] / country_data['population']
+        ) * 100
+        country_data.loc[country_data['cumulative_persons_fully_vaccinated'] == 0, 'percent_vaccinated'] = 0.0
+        country_data['percent_vaccinated'] = country_data['percent_vaccinated'].clip(upper=100).round(2)
+
+        country_data['date_str'] = country_data['date'].dt.strftime('%Y-%m-%d')
+
+        combined_full = pd.concat([combined_full, country_data])
+
+    combined_full.reset_index(drop=True, inplace=True)
+    return combined_full
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark demoprocess date-gap filling')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--legacy-max-scale', type=int, default=10,
+                        help='skip the old loop above this scale (it is quadratic)')
+    args = parser.parse_args()
+
+    print(f"{'scale':>6} {'input rows':>12} {'output rows':>12} {'loop (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for scale in args.scales:
+        combined = make_data(BASE_KEYS * scale)
+        filled, fast_time = time_call(fill_date_gaps, combined, START_DATE)
+
+        if scale <= args.legacy_max_scale:
+            expected, loop_time = time_call(fill_date_gaps_loop, combined, START_DATE)
+            if expected.to_csv(index=False) != filled.to_csv(index=False):
+                raise AssertionError(f"fill_date_gaps output differs from the loop at {scale}x")
+            loop_text, speedup_text = f"{loop_time:.2f}", f"{loop_time / fast_time:.1f}x"
+        else:
+            loop_text, speedup_text = "skipped", "-"
+
+        print(f"{scale:>5}x {len(combined):>12,} {len(filled):>12,} {loop_text:>10} {fast_time:>15.2f} {speedup_text:>8}")
+
+
+if __name__ == '__main__':
+    main()
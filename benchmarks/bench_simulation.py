@@ -0,0 +1,105 @@
+# Scaling benchmark for the R0 simulation in simulation/engine.py
+#
+# Times update_simulation at 100 to 100k agents and a few infection radii, with
+# the peak memory of each run, and writes everything to a JSON report. Runs are
+# seeded, so the same version gives the same final counts every time and a
+# report from another version can be passed to --compare.
+# Run from the repo root with: python benchmarks/bench_simulation.py
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from simulation import initialize_simulation, update_simulation, count_states
+
+AGENTS = [100, 1_000, 10_000, 100_000]
+RADII = [4, 8, 16]
+
+
+# run one case for a fixed number of steps
+def run_case(num_agents, radius, seed, infected_share, steps):
+    rng = np.random.default_rng(seed)
+    tracemalloc.start()
+    people = initialize_simulation(num_agents, infected_count=max(1, int(num_agents * infected_share)), rng=rng)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        update_simulation(people, 2.0, infection_radius=radius, rng=rng)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'agents': num_agents,
+        'radius': radius,
+        'steps': steps,
+        'seconds': round(elapsed, 4),
+        'steps_per_second': round(steps / elapsed, 2),
+        'peak_memory_mb': round(peak / 1e6, 3),
+        'state_mb': round(sum(array.nbytes for array in people.values()) / 1e6, 3),
+        'counts': count_states(people),
+    }
+
+
+# ratio of steps/s and peak memory against an older report, for the cases both have
+def compare(results, old_report):
+    old = {(case['agents'], case['radius']): case for case in old_report['results']}
+    print(f"\n{'agents':>8} {'radius':>7} {'steps/s':>12} {'memory':>12} {'same counts':>12}")
+    for case in results:
+        before = old.get((case['agents'], case['radius']))
+        if before is None:
+            continue
+        speed = case['steps_per_second'] / before['steps_per_second']
+        memory = case['peak_memory_mb'] / before['peak_memory_mb'] if before['peak_memory_mb'] else float('nan')
+        # with the same seed and steps a change in counts means the simulation itself changed
+        same = case['counts'] == before['counts'] and case['steps'] == before['steps']
+        print(f"{case['agents']:>8,} {case['radius']:>7g} {speed:>11.2f}x {memory:>11.2f}x {str(same):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark update_simulation at several population sizes and radii')
+    parser.add_argument('--agents', type=int, nargs='+', default=AGENTS)
+    parser.add_argument('--radii', type=float, nargs='+', default=RADII)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--infected-share', type=float, default=0.01,
+                        help='share of agents infected at the start, so large runs have work from step one')
+    parser.add_argument('--steps', type=int, default=100, help='steps per case')
+    parser.add_argument('--report', default='bench_simulation.json', help='where to write the JSON report')
+    parser.add_argument('--compare', help='an older report to compare against')
+    args = parser.parse_args()
+
+    print(f"{'agents':>8} {'radius':>7} {'steps':>7} {'steps/s':>10} {'peak MB':>9} {'state MB':>9}")
+    results = []
+    for num_agents in args.agents:
+        for radius in args.radii:
+            case = run_case(num_agents, radius, args.seed, args.infected_share, args.steps)
+            results.append(case)
+            print(f"{num_agents:>8,} {radius:>7g} {case['steps']:>7} {case['steps_per_second']:>10.1f} "
+                  f"{case['peak_memory_mb']:>9.2f} {case['state_mb']:>9.2f}")
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'infected_share': args.infected_share,
+        'steps': args.steps,
+        'results': results,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.report}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
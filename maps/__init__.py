@@ -0,0 +1,4 @@
+from maps.measures import (
+    json_path, measures, unique_dates, countries, date_positions, TEXT_COLOR,
+    map_frame, map_title, create_map,
+)
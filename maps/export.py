@@ -0,0 +1,153 @@
+import argparse
+import bisect
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from preProcessing.datastore import cache_dir, file_digest
+from maps.measures import unique_dates, map_frame, map_title, create_map
+
+# Headless export of the page3 map timeline to a numbered image sequence, and
+# optionally an animated GIF or video made from it, for reports.
+#
+# Every frame is drawn with create_map (same figure as page3) and rendered by
+# kaleido in a process pool. Rendered frames are cached in data/cache/map_frames
+# keyed by the frame's data, title and render settings (and the code drawing
+# it), so re-exporting after a data update only renders the dates that changed.
+#
+# Needs kaleido (pip install kaleido), Pillow for .gif and ffmpeg for videos.
+# Run from the repo root with: python -m maps.export --stride 7 --animation data/export/measures.gif
+
+frame_cache_dir = os.path.join(cache_dir, "map_frames")
+export_dir = os.path.join("data", "export", "measures")
+
+# changes to how the map is drawn invalidate the cached frames too
+figure_source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "measures.py")
+
+
+# the dates to export: start to end (inclusive, any date string that sorts
+# like the data's) every stride dates
+def select_dates(start=None, end=None, stride=1):
+    first = bisect.bisect_left(unique_dates, start) if start else 0
+    last = bisect.bisect_right(unique_dates, end) if end else len(unique_dates)
+    return list(range(first, last, max(1, stride)))
+
+
+def frame_key(index, settings, code_digest):
+    locations, values = map_frame(index)
+    key_source = json.dumps([locations, values, map_title(unique_dates[index]), settings, code_digest], sort_keys=True)
+    return hashlib.sha256(key_source.encode()).hexdigest()[:16]
+
+
+def _render(task):
+    index, path, settings = task
+    fig = create_map(unique_dates[index])
+    if settings["background"]:
+        # the page draws on the app's dark CSS background, images need their own
+        fig.update_layout(paper_bgcolor=settings["background"], geo=dict(bgcolor=settings["background"]))
+    # write then rename so an interrupted export never leaves half a frame in the cache
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.write_image(tmp_path, format=settings["format"], scale=settings["scale"])
+    os.replace(tmp_path, path)
+    return index
+
+
+# hard link the cached frame into the sequence, copy where links don't work
+def _place(cached_path, path):
+    try:
+        os.link(cached_path, path)
+    except OSError:
+        shutil.copyfile(cached_path, path)
+
+
+def stitch_gif(frame_paths, animation_path, fps):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise SystemExit("Pillow is needed for .gif output (pip install pillow), or pick a video extension for ffmpeg")
+    frames = [Image.open(path) for path in frame_paths]
+    frames[0].save(animation_path, save_all=True, append_images=frames[1:], duration=round(1000 / fps), loop=0)
+
+
+def stitch_video(out_dir, image_format, animation_path, fps):
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg is needed for video output, or use a .gif file name")
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps),
+        "-i", os.path.join(out_dir, f"frame_%05d.{image_format}"),
+        # even dimensions and yuv420p so the result plays everywhere
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", animation_path,
+    ], check=True)
+
+
+# renders the missing frames and writes out_dir/frame_00000.<format>, ...
+# returns the frame paths in order
+def export_frames(indexes, out_dir=export_dir, image_format="png", scale=1, background="#121212", workers=None):
+    settings = {"format": image_format, "scale": scale, "background": background}
+    code_digest = file_digest(figure_source)
+    os.makedirs(frame_cache_dir, exist_ok=True)
+
+    cached_paths = [os.path.join(frame_cache_dir, f"{frame_key(index, settings, code_digest)}.{image_format}")
+                    for index in indexes]
+    missing = {path: index for index, path in zip(indexes, cached_paths) if not os.path.exists(path)}
+    print(f"{len(indexes)} frames, {len(indexes) - len(missing)} from the cache, rendering {len(missing)}")
+
+    if missing:
+        start = time.perf_counter()
+        tasks = [(index, path, settings) for path, index in missing.items()]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done, _ in enumerate(executor.map(_render, tasks, chunksize=4), start=1):
+                if done % 50 == 0 or done == len(tasks):
+                    elapsed = time.perf_counter() - start
+                    print(f"rendered {done}/{len(tasks)} in {elapsed:.0f}s ({done / elapsed:.1f} frames/s)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    for old_path in glob.glob(os.path.join(out_dir, "frame_*.*")):
+        os.remove(old_path)
+    frame_paths = []
+    for number, cached_path in enumerate(cached_paths):
+        path = os.path.join(out_dir, f"frame_{number:05d}.{image_format}")
+        _place(cached_path, path)
+        frame_paths.append(path)
+    return frame_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the government measures map timeline as images")
+    parser.add_argument("--start", help="first date, e.g. 2020-03-01 (defaults to the first in the data)")
+    parser.add_argument("--end", help="last date (defaults to the last in the data)")
+    parser.add_argument("--stride", type=int, default=1, help="export every n-th date")
+    parser.add_argument("--out", default=export_dir, help="directory for the numbered frames")
+    parser.add_argument("--format", default="png", choices=["png", "jpg", "webp", "svg", "pdf"])
+    parser.add_argument("--scale", type=float, default=1, help="image scale factor (1 = 1400x700)")
+    parser.add_argument("--background", default="#121212", help="page colour, empty for transparent")
+    parser.add_argument("--workers", type=int, default=None, help="render processes, defaults to the CPU count")
+    parser.add_argument("--animation", help="also write an animation: .gif (Pillow) or .mp4/.webm/... (ffmpeg)")
+    parser.add_argument("--fps", type=float, default=10)
+    args = parser.parse_args()
+
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        raise SystemExit("kaleido is needed to render the images (pip install kaleido)")
+
+    indexes = select_dates(args.start, args.end, args.stride)
+    if not indexes:
+        raise SystemExit("no dates in that range")
+    frame_paths = export_frames(indexes, args.out, args.format, args.scale, args.background, args.workers)
+    print(f"wrote {len(frame_paths)} frames ({unique_dates[indexes[0]]} to {unique_dates[indexes[-1]]}) to {args.out}")
+
+    if args.animation:
+        if args.format not in ("png", "jpg", "webp"):
+            raise SystemExit("animations need --format png, jpg or webp")
+        os.makedirs(os.path.dirname(args.animation) or ".", exist_ok=True)
+        if args.animation.lower().endswith(".gif"):
+            stitch_gif(frame_paths, args.animation, args.fps)
+        else:
+            stitch_video(args.out, args.format, args.animation, args.fps)
+        print(f"wrote {args.animation}")
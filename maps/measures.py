@@ -0,0 +1,71 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from preProcessing.datastore import load_matrix, matrix_paths
+
+# The government measures map, shared by page3 and the static export
+# (maps/export.py) so both draw the same figure.
+
+# Ensure the data exists, either the JSON records or the matrix built from them
+json_path = os.path.join("data", "government_measures.json")
+if not os.path.exists(json_path) and not os.path.exists(matrix_paths(json_path)[0]):
+    raise FileNotFoundError(f"Error: {json_path} not found!")
+
+# normalized measures as a (dates x countries) matrix, memory-mapped when the
+# .npy file written by mapjson.py is there
+measures, unique_dates, countries = load_matrix(json_path)
+countries = np.array(countries)
+date_positions = {date: i for i, date in enumerate(unique_dates)}
+
+TEXT_COLOR = "#00FFC6"  # override CSS
+
+
+# countries and values for one date, from one row of the matrix (NaN where a
+# country has no record for that date). Cached since playback loops over the
+# same dates, and a frame is only a few KB
+@lru_cache(maxsize=1024)
+def map_frame(index):
+    row = np.asarray(measures[index])
+    has_data = ~np.isnan(row)
+    return countries[has_data].tolist(), np.round(row[has_data].astype(float), 4).tolist()
+
+
+def map_title(date_selected):
+    return f"Level of COVID-19 measures, circa {date_selected}"
+
+
+# the full map for one date
+def create_map(date_selected):
+    locations, values = map_frame(date_positions[date_selected])
+    df_filtered = pd.DataFrame({"iso_a3": locations, "normalized_measures": values})
+    fig = px.choropleth(
+        df_filtered,
+        locations="iso_a3",
+        color="normalized_measures",
+        hover_name="iso_a3",
+        color_continuous_scale="Reds",
+        projection="natural earth",
+        title=map_title(date_selected),
+    )
+    fig.update_layout(
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        geo=dict(showcoastlines=True, showland=True),
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        paper_bgcolor="rgba(0, 0, 0, 0)",  # Ensure transparency
+        title=dict(font=dict(color=TEXT_COLOR)),
+        coloraxis_colorbar=dict(
+            title="Level of Measures",
+            title_font=dict(color=TEXT_COLOR),
+            tickfont=dict(color="#A9A9A9"),
+            bgcolor="rgba(0, 0, 0, 0)",
+            outlinecolor="#333333",
+        ),
+        width=1400,
+        height=700,
+        uirevision="page3",  # keeps the user's zoom/pan when the data changes
+    )
+    return fig
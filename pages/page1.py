@@ -1,27 +1,41 @@
+from functools import lru_cache
+import re
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, no_update
 from dash import dash_table
 import plotly.express as px
-import pandas as pd
 import numpy as np
+import plotly
+from preProcessing.datastore import load_table, table_source, cached_json
 
 dash.register_page(__name__, path="/page1")
 
-df = pd.read_csv('data/vaccination_continent.csv')
+data_path = 'data/vaccination_continent.csv'
+min_population = 100_000
+top_n = 100
 
-df['date'] = pd.to_datetime(df['date'])
-df['date_str'] = df['date'].dt.strftime('%Y-%m-%d')
+# stream_frames sends the bubble chart's frames to the browser in chunks as the
+# date slider moves, so the page renders straight away and can use every day.
+# Turning it off embeds every frame in the figure, which needs the 10 day sampling.
+stream_frames = True
+day_step = 1 if stream_frames else 10
+frame_chunk_size = 30
+# ask for the next chunk this many frames before the end of the current one
+frame_prefetch = 10
+
+# dates come back already parsed, and date_str is written by demoprocess.py
+df = load_table(data_path)
 df = df.sort_values('date')
 
-# remove countries with less than 100k population, also only show data once every 10 days
-df = df[df['population'] >= 100_000]
-df = df[df['date'].dt.day % 10 == 0]
+# remove countries with less than 100k population, also only show data once every day_step days
+df = df[df['population'] >= min_population]
+df = df[df['date'].dt.day % day_step == 0]
 
 # use top 100 countries by population
 top_countries = (
-    df.groupby('location_key')['population']
+    df.groupby('location_key', observed=True)['population']
     .max()
-    .nlargest(100)
+    .nlargest(top_n)
     .index
 )
 df = df[df['location_key'].isin(top_countries)]
@@ -30,6 +44,139 @@ df = df[df['location_key'].isin(top_countries)]
 continents = df['continent'].unique()
 date_options = sorted(df['date_str'].unique())
 
+# animated bubble chart, building every frame takes a few seconds
+def create_bubble_chart():
+    return px.scatter(
+        df,
+        x='gdp_per_capita_usd',
+        y='percent_vaccinated',
+        size='population',
+        color='location_key',
+        hover_name='country_name',
+        size_max=70,
+        animation_frame='date_str',
+        template='plotly_dark',
+        title='COVID-19 Vaccination vs GDP per Capita Over Time',
+        height=700,
+        labels={
+            'gdp_per_capita_usd': 'GDP per Capita (USD)',
+            'percent_vaccinated': 'Percent of Population Vaccinated'
+        }
+    ).update_layout(
+        xaxis_type='log',
+        xaxis_title='GDP per Capita (USD)',
+        yaxis_title='% Fully Vaccinated',
+        yaxis=dict(range=[0, 100]),
+        showlegend=False
+    )
+
+
+# streaming version: just the traces and layout, drawn at the first date. The
+# browser swaps in each date's x, y and size from the chunks sent by load_frame_chunk.
+def create_stream_chart():
+    # one row per country so every trace exists even if it has no data on the first date
+    fig = px.scatter(
+        df.drop_duplicates('location_key'),
+        x='gdp_per_capita_usd',
+        y='percent_vaccinated',
+        size='population',
+        color='location_key',
+        hover_name='country_name',
+        size_max=70,
+        template='plotly_dark',
+        title='COVID-19 Vaccination vs GDP per Capita Over Time',
+        height=700,
+        labels={
+            'gdp_per_capita_usd': 'GDP per Capita (USD)',
+            'percent_vaccinated': 'Percent of Population Vaccinated'
+        }
+    )
+    # size bubbles against the whole run rather than the first date, and show
+    # the frame's date (kept in the trace meta) in the hover like the animation did
+    fig.update_traces(marker_sizeref=2.0 * df['population'].max() / 70 ** 2, meta=[date_options[0]])
+    fig.for_each_trace(lambda trace: trace.update(hovertemplate=trace.hovertemplate.replace(
+        '<br>GDP per Capita (USD)=', '<br>date_str=%{meta[0]}<br>GDP per Capita (USD)=', 1
+    )))
+
+    # fixed x range over every date, otherwise each frame would rescale the axis
+    gdp = df['gdp_per_capita_usd'].dropna()
+    return fig.update_layout(
+        xaxis_type='log',
+        xaxis_range=[np.log10(gdp.min()) - 0.1, np.log10(gdp.max()) + 0.1] if len(gdp) else None,
+        xaxis_title='GDP per Capita (USD)',
+        yaxis_title='% Fully Vaccinated',
+        yaxis=dict(range=[0, 100]),
+        showlegend=False,
+        uirevision='bubble-chart'
+    )
+
+
+# the finished figure is cached on disk, keyed by the data file and the filters above
+bubble_chart = cached_json(
+    'page1_bubble_chart',
+    table_source(data_path),
+    {
+        'min_population': min_population, 'day_step': day_step, 'top_n': top_n,
+        'stream_frames': stream_frames, 'plotly': plotly.__version__
+    },
+    lambda: (create_stream_chart() if stream_frames else create_bubble_chart()).to_json()
+)
+
+# per-date values for every trace, (dates x traces) in the figure's trace order
+frame_dates = date_options
+trace_keys = [trace['name'] for trace in bubble_chart['data']]
+# one row per (date, location) for the pivot, the last one wins if the data has duplicates
+frame_df = df.astype({'location_key': str, 'date_str': str}).drop_duplicates(['date_str', 'location_key'], keep='last')
+frame_values = {
+    column: frame_df.pivot(index='date_str', columns='location_key', values=column)
+    .reindex(index=frame_dates, columns=trace_keys)
+    .to_numpy(dtype='float64')
+    for column in ['gdp_per_capita_usd', 'percent_vaccinated', 'population']
+}
+
+
+# frame_chunk_size frames starting at index start, NaN (no data) sent as null
+def frame_chunk(start):
+    stop = min(start + frame_chunk_size, len(frame_dates))
+
+    def rows(column, decimals):
+        block = np.round(frame_values[column][start:stop], decimals).tolist()
+        return [[None if np.isnan(value) else value for value in row] for row in block]
+
+    return {
+        'start': start,
+        'dates': frame_dates[start:stop],
+        'x': rows('gdp_per_capita_usd', 2),
+        'y': rows('percent_vaccinated', 2),
+        'size': rows('population', 0)
+    }
+
+
+if stream_frames:
+    bubble_chart_components = [
+        dcc.Graph(id='bubble-chart', figure=bubble_chart),
+        html.Div([
+            html.Button('Play', id='bubble-play-button', n_clicks=0, style={'marginRight': '20px'}),
+            html.Div([
+                dcc.Slider(
+                    id='bubble-date-slider',
+                    min=0,
+                    max=len(frame_dates) - 1,
+                    value=0,
+                    step=1,
+                    marks={i: frame_dates[i] for i in range(0, len(frame_dates), max(1, len(frame_dates) // 8))}
+                )
+            ], style={'flex': '1'})
+        ], style={'display': 'flex', 'alignItems': 'center'}),
+        dcc.Interval(id='bubble-interval', interval=200, n_intervals=0, disabled=True),
+        # the first chunk ships with the page so playback can start without a round trip
+        dcc.Store(id='bubble-frame-chunk', data=frame_chunk(0)),
+        dcc.Store(id='bubble-frame-cache', data=[]),
+        dcc.Store(id='bubble-frame-request', data=None)
+    ]
+else:
+    bubble_chart_components = [dcc.Graph(id='bubble-chart', figure=bubble_chart)]
+
 # Layout
 layout = html.Div([
     html.H2("Vaccination Percentage vs. GDP per Capita", style={"color": "white"}),
@@ -44,32 +191,7 @@ layout = html.Div([
     ),
 
     # Bubble Chart (animated)
-    dcc.Graph(
-        id='bubble-chart',
-        figure=px.scatter(
-            df,
-            x='gdp_per_capita_usd',
-            y='percent_vaccinated',
-            size='population',
-            color='location_key',
-            hover_name='country_name',
-            size_max=70,
-            animation_frame='date_str',
-            template='plotly_dark',
-            title='COVID-19 Vaccination vs GDP per Capita Over Time',
-            height=700,
-            labels={
-                'gdp_per_capita_usd': 'GDP per Capita (USD)',
-                'percent_vaccinated': 'Percent of Population Vaccinated'
-            }
-        ).update_layout(
-            xaxis_type='log',
-            xaxis_title='GDP per Capita (USD)',
-            yaxis_title='% Fully Vaccinated',
-            yaxis=dict(range=[0, 100]),
-            showlegend=False
-        )
-    ),
+    *bubble_chart_components,
 
     # Date dropdown to update the table
     html.Label("Select Date for Table", style={"color": "white", "marginTop": "20px"}),
@@ -94,63 +216,283 @@ layout = html.Div([
         style_cell={'textAlign': 'left', 'padding': '5px', 'minWidth': '100px', 'maxWidth': '250px', 'whiteSpace': 'normal'},
         style_header={'backgroundColor': 'rgb(30, 30, 30)', 'color': 'white', 'fontWeight': 'bold'},
         style_data={'backgroundColor': 'rgb(50, 50, 50)', 'color': 'white'},
-        sort_action='native',
-        filter_action='native',
+        # paging, sorting and filtering run on the server (update_table), which also
+        # sends per-row cell colours for the visible page as style_data_conditional
+        page_action='custom',
+        sort_action='custom',
+        filter_action='custom',
+        page_current=0,
         page_size=100,
-        style_data_conditional=[
-            # Gradient for 'percent_vaccinated' (0% red, 100% green)
-            {
-                'if': {
-                    'column_id': 'percent_vaccinated'
-                },
-                'backgroundColor': 'white',  # default fallback color
-                'color': 'black'
-            }
-        ] + [
-            {
-                'if': {
-                    'filter_query': f'{{percent_vaccinated}} >= {i} && {{percent_vaccinated}} < {i + 5}',
-                    'column_id': 'percent_vaccinated'
-                },
-                # Fix: Red to Green (0% = red, 100% = green)
-                'backgroundColor': f'rgba({255 - int(i * 2.55)}, {int(i * 2.55)}, 0, 0.8)',  # Red to green gradient
-                'color': 'white'
-            }
-            for i in range(0, 101, 5)
-        ] + [
-            # Apply a gradient to 'gdp_per_capita_usd' based on log-transformed values
-            {
-                'if': {
-                    'filter_query': f'{{gdp_per_capita_usd}} >= {i * 1000} && {{gdp_per_capita_usd}} < {(i + 5) * 1000}',
-                    'column_id': 'gdp_per_capita_usd'
-                },
-                # Fix: Red to Green (low GDP = red, high GDP = green)
-                'backgroundColor': f'rgba({255 - int(i * 2.55)}, {int(i * 2.55)}, 0, 0.8)',  # Red to green gradient
-                'color': 'white'
-            }
-            for i in range(0, 101, 5)  # Adjust for intervals of 5, since GDP can vary greatly
-        ]
+        sort_by=[],
+        filter_query=''
     )
 ])
 
+# red (low) to green (high) in 21 buckets of 5, the percent column uses 5% buckets
+# and GDP per capita uses $5k buckets
+bucket_colors = np.array(
+    [f'rgba({255 - int(i * 2.55)}, {int(i * 2.55)}, 0, 0.8)' for i in range(0, 101, 5)], dtype=object
+)
+
+
+# background colour per value, None when it's outside the buckets (or missing)
+def bucket_color(values, bucket_width):
+    buckets = np.floor(np.asarray(values, dtype='float64') / bucket_width)
+    in_range = (buckets >= 0) & (buckets < len(bucket_colors))
+    colors = np.full(len(buckets), None, dtype=object)
+    colors[in_range] = bucket_colors[buckets[in_range].astype(int)]
+    return colors
+
+
+# table rows split up by date once at load time, with the cell colours worked out up front
+table_columns = [
+    'country_name',
+    'percent_vaccinated',
+    'population',
+    'cumulative_persons_fully_vaccinated',
+    'gdp_per_capita_usd'
+]
+table_df = df[table_columns + ['continent', 'date_str']].copy()
+# plain strings for sorting and filtering, with missing names left empty rather than 'nan'
+table_df['country_name'] = table_df['country_name'].astype(object).fillna('')
+# back to the 2 decimal values demoprocess.py wrote, rather than their float32 approximations
+table_df['percent_vaccinated'] = table_df['percent_vaccinated'].astype('float64').round(2)
+table_df['percent_color'] = bucket_color(table_df['percent_vaccinated'], 5)
+table_df['gdp_color'] = bucket_color(table_df['gdp_per_capita_usd'], 5000)
+table_rows_by_date = {
+    date: rows.drop(columns='date_str') for date, rows in table_df.groupby('date_str', observed=True)
+}
+
+# filter_query operators, as written by the DataTable filter row, and what they map to
+filter_operators = [
+    ['ge', '>='], ['le', '<='], ['lt', '<'], ['gt', '>'],
+    ['ne', '!='], ['eq', '='], ['contains'], ['datestartswith']
+]
+filter_operator_names = {
+    operator: operator_type[0] for operator_type in filter_operators for operator in operator_type
+}
+# '{column} operator value', the operator has to come straight after the column
+filter_part_pattern = re.compile(r'\s*\{(.+?)\}\s*(\S+)\s+(.*)')
+
+
+# '{population} > 1000000' -> ('population', 'gt', 1000000.0)
+def split_filter_part(filter_part):
+    match = filter_part_pattern.match(filter_part)
+    if match is None:
+        return None, None, None
+    name, operator, value_part = match.groups()
+    operator = filter_operator_names.get(operator.lower())
+    if operator is None:
+        return None, None, None
+    value_part = value_part.strip()
+    quote = value_part[:1]
+    if quote in ("'", '"', '`') and len(value_part) > 1 and value_part[-1] == quote:
+        value = value_part[1:-1].replace('\\' + quote, quote)
+    else:
+        try:
+            value = float(value_part)
+        except ValueError:
+            value = value_part
+    return name, operator, value
+
+
+def apply_filter(rows, filter_query):
+    for filter_part in filter_query.split(' && '):
+        column, operator, value = split_filter_part(filter_part)
+        if column not in rows.columns:
+            continue
+        try:
+            if operator == 'contains':
+                rows = rows[rows[column].astype(str).str.contains(str(value), regex=False)]
+            elif operator == 'datestartswith':
+                rows = rows[rows[column].astype(str).str.startswith(str(value))]
+            else:
+                rows = rows[getattr(rows[column], operator)(value)]
+        except TypeError:
+            # e.g. '< abc' on a number column, the table ignores those too
+            continue
+    return rows
+
+
+# rows for one date and set of continents, before any filtering or sorting
+@lru_cache(maxsize=256)
+def table_rows(continents, selected_date):
+    rows = table_rows_by_date.get(selected_date)
+    if rows is None:
+        return table_df.iloc[:0].drop(columns='date_str')
+    return rows[rows['continent'].isin(continents)]
+
+
+# one page of the table: records, page count and the colour rules for those rows.
+# Cached on the whole query, so repeated interactions (from any user) are a dict lookup.
+@lru_cache(maxsize=1024)
+def table_page(continents, selected_date, filter_query, sort_by, page_current, page_size):
+    rows = table_rows(continents, selected_date)
+    if filter_query:
+        rows = apply_filter(rows, filter_query)
+    if sort_by:
+        rows = rows.sort_values(
+            [column for column, _ in sort_by],
+            ascending=[direction == 'asc' for _, direction in sort_by],
+            kind='stable',
+            na_position='last'
+        )
+
+    page_count = max(1, -(-len(rows) // page_size))
+    page_current = min(page_current, page_count - 1)
+    page = rows.iloc[page_current * page_size:(page_current + 1) * page_size]
+
+    styles = []
+    for i, (percent_color, gdp_color) in enumerate(zip(page['percent_color'], page['gdp_color'])):
+        # no bucket for the percentage falls back to white, like the old default rule
+        styles.append({
+            'if': {'row_index': i, 'column_id': 'percent_vaccinated'},
+            'backgroundColor': percent_color or 'white',
+            'color': 'white' if percent_color else 'black'
+        })
+        if gdp_color:
+            styles.append({
+                'if': {'row_index': i, 'column_id': 'gdp_per_capita_usd'},
+                'backgroundColor': gdp_color,
+                'color': 'white'
+            })
+
+    return page[table_columns].to_dict('records'), page_count, styles
+
+
 # Callback to update DataTable only
 @dash.callback(
     Output('top-10-table', 'data'),
+    Output('top-10-table', 'page_count'),
+    Output('top-10-table', 'style_data_conditional'),
     Input('continent-checklist', 'value'),
-    Input('table-date-dropdown', 'value')
+    Input('table-date-dropdown', 'value'),
+    Input('top-10-table', 'page_current'),
+    Input('top-10-table', 'page_size'),
+    Input('top-10-table', 'sort_by'),
+    Input('top-10-table', 'filter_query')
 )
-def update_table(selected_continents, selected_date):
-    filtered_df = df[df['continent'].isin(selected_continents)]
-    filtered_df = filtered_df[filtered_df['date_str'] == selected_date]
+def update_table(selected_continents, selected_date, page_current, page_size, sort_by, filter_query):
+    sort_key = tuple((sort['column_id'], sort['direction']) for sort in sort_by or [])
+    return table_page(
+        frozenset(selected_continents or []), selected_date, filter_query or '',
+        sort_key, page_current or 0, page_size or 100
+    )
+
+if stream_frames:
+    # serve the chunk starting at the frame index the browser asked for
+    @dash.callback(
+        Output('bubble-frame-chunk', 'data'),
+        Input('bubble-frame-request', 'data'),
+        prevent_initial_call=True
+    )
+    def load_frame_chunk(start):
+        if not isinstance(start, int) or not 0 <= start < len(frame_dates):
+            return no_update
+        return frame_chunk(start)
 
-    # Ensure we use the logarithmic transformation for GDP
-    filtered_df['gdp_per_capita_usd_log'] = np.log10(filtered_df['gdp_per_capita_usd'] + 1)  # Adding 1 to avoid log(0)
+    # draw the slider's date from the chunks held in the browser. The server is only
+    # asked (through bubble-frame-request) when the index has no chunk, or when it gets
+    # within frame_prefetch frames of the end of its chunk so the next one arrives early.
+    # Chunks arriving in bubble-frame-chunk are kept in bubble-frame-cache, which only
+    # holds the current and next chunk and never goes back to the server.
+    dash.clientside_callback(
+        """
+        function(index, incoming, cache, requested, figure, max) {
+            var no_update = window.dash_clientside.no_update;
+            var prefetch = FRAME_PREFETCH;
+            var chunks = (cache || []).slice();
+            if (incoming && !chunks.some(function(c) { return c.start === incoming.start; })) {
+                chunks.push(incoming);
+            }
+            function find(i) {
+                for (var k = 0; k < chunks.length; k++) {
+                    if (i >= chunks[k].start && i < chunks[k].start + chunks[k].dates.length) {
+                        return chunks[k];
+                    }
+                }
+                return null;
+            }
 
-    return filtered_df[[  # Return data with log-transformed GDP values
-        'country_name',
-        'percent_vaccinated',
-        'population',
-        'cumulative_persons_fully_vaccinated',
-        'gdp_per_capita_usd'
-    ]].to_dict('records')
+            // a request is still in flight until a chunk with its start comes back
+            var pending = requested !== null && requested !== undefined
+                && !(incoming && incoming.start === requested);
+            var chunk = find(index);
+            var wanted = null;
+            var kept;
+            if (chunk) {
+                var end = chunk.start + chunk.dates.length;
+                var next = end > max ? 0 : end;
+                var nextChunk = find(next);
+                if (!nextChunk && end - index <= prefetch) {
+                    wanted = next;
+                }
+                kept = chunks.filter(function(c) { return c === chunk || c === nextChunk; });
+            } else {
+                wanted = index;
+                kept = chunks.slice(-2);
+            }
+            if (wanted !== null && !(pending && wanted === requested)) {
+                // set_props rather than an Output, the request feeds load_frame_chunk whose
+                // chunk comes back in here, and Dash won't allow that cycle across two callbacks
+                window.dash_clientside.set_props('bubble-frame-request', {data: wanted});
+            }
 
+            var same = cache && cache.length === kept.length && kept.every(function(c, k) {
+                return cache[k].start === c.start;
+            });
+            var cacheOut = same ? no_update : kept;
+
+            if (!chunk || !figure) {
+                return [no_update, cacheOut];
+            }
+            var row = index - chunk.start;
+            var data = figure.data.map(function(trace, j) {
+                return Object.assign({}, trace, {
+                    x: [chunk.x[row][j]],
+                    y: [chunk.y[row][j]],
+                    marker: Object.assign({}, trace.marker, {size: [chunk.size[row][j]]}),
+                    meta: [chunk.dates[row]]
+                });
+            });
+            return [Object.assign({}, figure, {data: data}), cacheOut];
+        }
+        """.replace('FRAME_PREFETCH', str(frame_prefetch)),
+        Output('bubble-chart', 'figure'),
+        Output('bubble-frame-cache', 'data'),
+        Input('bubble-date-slider', 'value'),
+        Input('bubble-frame-chunk', 'data'),
+        State('bubble-frame-cache', 'data'),
+        State('bubble-frame-request', 'data'),
+        State('bubble-chart', 'figure'),
+        State('bubble-date-slider', 'max')
+    )
+
+    # play/pause switches the interval on and off, through the tick scheduler
+    # so it also stops while the tab is hidden (assets/tick_scheduler.js)
+    dash.clientside_callback(
+        """
+        function(n_clicks) {
+            var playing = n_clicks % 2 === 1;
+            return [playing ? 'Pause' : 'Play', window.tickScheduler.gate('bubble-interval', playing)];
+        }
+        """,
+        Output('bubble-play-button', 'children'),
+        Output('bubble-interval', 'disabled'),
+        Input('bubble-play-button', 'n_clicks'),
+        prevent_initial_call=True
+    )
+
+    # step the slider forward on each tick, wrapping round at the end
+    dash.clientside_callback(
+        """
+        function(n_intervals, index, max) {
+            return index >= max ? 0 : index + 1;
+        }
+        """,
+        Output('bubble-date-slider', 'value'),
+        Input('bubble-interval', 'n_intervals'),
+        State('bubble-date-slider', 'value'),
+        State('bubble-date-slider', 'max'),
+        prevent_initial_call=True
+    )
@@ -1,134 +1,68 @@
 import dash
-from dash import html, dcc
+from dash import html, dcc, Patch, no_update
 import plotly.graph_objects as go
 import numpy as np
-import random
-from dash.dependencies import Input, Output, State
+import os
+import secrets
+import uuid
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+from simulation import (
+    HEALTHY, INFECTED, RECOVERED, VACCINATED, width, height, infection_radius, duration, speed,
+    initialize_simulation, update_simulation, count_states, new_session, get_session, save_session,
+    series, new_history, append_history, complete_buckets, history_points
+)
+from simulation.compartmental import solve_compartmental
+from simulation.sweep import sweep_path
+from preProcessing.datastore import load_table, table_source
 
 # this registers the page in a multi-page dash app
 dash.register_page(__name__, path="/page2")
 
-history = []
-
-# some constants for the simulation setup
+# starting population, the simulation itself lives in simulation/engine.py.
+# Every browser tab gets its own simulation, kept in simulation/sessions.py
 num_people = 100
-width, height = 300, 300
-infection_radius = 8
-duration = 150  # how long someone stays infected before recovering
-
-# function to set up everyone at the start of the simulation
-def initialize_simulation(infected_count=1, vaccination_percentage=0):
-    people = []
-    for _ in range(num_people):
-        people.append({
-            "x": random.uniform(0, width),  # random starting x position
-            "y": random.uniform(0, height),  # random starting y position
-            "vx": random.uniform(-1, 1),  # random x direction/speed
-            "vy": random.uniform(-1, 1),  # random y direction/speed
-            "infected": False,
-            "recovered": False,
-            "vaccinated": False, 
-            "time_infected": 0  # track how long someone has been infected
-        })
-    
-    # figure out how many people should be vaccinated
-    vaccinated_count = int(num_people * (vaccination_percentage / 100))
-    for i in range(vaccinated_count):
-        people[i]["vaccinated"] = True
-
-    # infect the first few who aren't vaccinated
-    non_vaccinated = [p for p in people if not p["vaccinated"]]
-    for i in range(min(infected_count, len(non_vaccinated))):
-        non_vaccinated[i]["infected"] = True
-    
-    return people
-
-# function to update positions and spread infection each tick
-def update_simulation(people, R0):
-    grid_size = infection_radius * 2
-    grid = {}
-
-    # divide the space into grid cells for faster neighbor lookup
-    for i, person in enumerate(people):
-        grid_x = int(person["x"] // grid_size)
-        grid_y = int(person["y"] // grid_size)
-        grid.setdefault((grid_x, grid_y), []).append(i)
-
-    new_people = []
-    for person in people:
-        # move each person
-        person["x"] += person["vx"] * 2
-        person["y"] += person["vy"] * 2
-
-        # bounce off the walls if they hit the edges
-        if person["x"] < 0 or person["x"] > width:
-            person["vx"] *= -1
-        if person["y"] < 0 or person["y"] > height:
-            person["vy"] *= -1
-
-        # check if infected person has recovered
-        if person["infected"]:
-            person["time_infected"] += 1
-            if person["time_infected"] > duration:
-                person["infected"] = False
-                person["recovered"] = True
-
-        new_people.append(person)
-
-    # go through neighbors and try to spread the infection
-    for i, p1 in enumerate(new_people):
-        if p1["infected"]:
-            grid_x = int(p1["x"] // grid_size)
-            grid_y = int(p1["y"] // grid_size)
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    neighbors = grid.get((grid_x + dx, grid_y + dy), [])
-                    for j in neighbors:
-                        if i != j:
-                            p2 = new_people[j]
-                            # only infect if they're not immune and close enough
-                            if not p2["infected"] and not p2["recovered"] and not p2["vaccinated"]:
-                                distance = np.sqrt((p1["x"] - p2["x"])**2 + (p1["y"] - p2["y"])**2)
-                                # infection probability based off of R0 set by user
-                                if distance < infection_radius and random.random() < R0 / 10:
-                                    p2["infected"] = True
-
-    return new_people
+
+# after the first frame the graphs are only sent what changed: new agent
+# positions for the scatter and new points for the time series. The history is
+# decimated (simulation/history.py), so the time series is resent whole only
+# when its buckets get merged. If ticks were missed (slow server or network)
+# one callback runs up to max_steps_per_tick simulation steps to catch up.
+max_steps_per_tick = 5
+
+# scatter trace order in create_figure
+trace_states = [VACCINATED, INFECTED, RECOVERED, HEALTHY]
+
+# outbreak sizes over many runs, precomputed with python -m simulation.sweep
+sweep = load_table(sweep_path) if os.path.exists(table_source(sweep_path)) else None
+
+# every run is seeded, with the seed typed in on the page or a random one, and
+# the seed is shown next to the counters so a run can be replayed
+def run_seed(seed_value):
+    return int(seed_value) if seed_value is not None else secrets.randbits(32)
+
 
 # create the plotly figure with different color dots for each group
 def create_figure(people, r0):
-    infected_x, infected_y = [], []
-    recovered_x, recovered_y = [], []
-    healthy_x, healthy_y = [], []
-    vaccinated_x, vaccinated_y = [], []
-
-    for person in people:
-        if person["vaccinated"]:
-            vaccinated_x.append(person["x"])
-            vaccinated_y.append(person["y"])
-        elif person["infected"]:
-            infected_x.append(person["x"])
-            infected_y.append(person["y"])
-        elif person["recovered"]:
-            recovered_x.append(person["x"])
-            recovered_y.append(person["y"])
-        else:
-            healthy_x.append(person["x"])
-            healthy_y.append(person["y"])
+    x, y, state = people["x"], people["y"], people["state"]
+    vaccinated = state == VACCINATED
+    infected = state == INFECTED
+    recovered = state == RECOVERED
+    healthy = state == HEALTHY
 
     fig = go.Figure(layout=dict(template="plotly_dark"))
-    fig.add_trace(go.Scattergl(x=vaccinated_x, y=vaccinated_y, mode='markers',
+    fig.add_trace(go.Scattergl(x=x[vaccinated], y=y[vaccinated], mode='markers',
                                marker=dict(color='blue', size=5), name='Vaccinated'))
-    fig.add_trace(go.Scattergl(x=infected_x, y=infected_y, mode='markers',
+    fig.add_trace(go.Scattergl(x=x[infected], y=y[infected], mode='markers',
                                marker=dict(color='red', size=5), name='Infected'))
-    fig.add_trace(go.Scattergl(x=recovered_x, y=recovered_y, mode='markers',
+    fig.add_trace(go.Scattergl(x=x[recovered], y=y[recovered], mode='markers',
                                marker=dict(color='green', size=5), name='Recovered'))
-    fig.add_trace(go.Scattergl(x=healthy_x, y=healthy_y, mode='markers',
+    fig.add_trace(go.Scattergl(x=x[healthy], y=y[healthy], mode='markers',
                                marker=dict(color='white', size=5), name='Healthy'))
 
     # set up layout and axis settings
     fig.update_layout(
-        title=f"R0 = {r0:.1f}, Population = {num_people}",
+        title=figure_title(people, r0),
         xaxis=dict(
             range=[0, width],
             scaleanchor="y",
@@ -147,16 +81,46 @@ def create_figure(people, r0):
     return fig
 
 
-def create_time_series(history):
-    steps = [h["step"] for h in history]
-    infected = [h["infected"] for h in history]
-    recovered = [h["recovered"] for h in history]
-    vaccinated = [h["vaccinated"] for h in history]
+def figure_title(people, r0):
+    return f"R0 = {r0:.1f}, Population = {len(people['state'])}"
+
+
+# only the new positions and title for the figure create_figure made. Positions
+# are rounded to 0.1 (well under a pixel) to keep the payload small
+def scatter_patch(people, r0):
+    patch = Patch()
+    state = people["state"]
+    for i, group in enumerate(trace_states):
+        mask = state == group
+        patch["data"][i]["x"] = np.round(people["x"][mask], 1)
+        patch["data"][i]["y"] = np.round(people["y"][mask], 1)
+    patch["layout"]["title"]["text"] = figure_title(people, r0)
+    return patch
+
+
+# extendData for the time series traces (in the order of series) with the
+# history buckets from start to end
+def time_series_points(history, start, end):
+    points = history_points(history, start, end)
+    return [
+        dict(
+            x=[points[name][0] for name in series],
+            y=[points[name][1] for name in series],
+        ),
+        [0, 1, 2],
+    ]
+
+
+def create_time_series(history, end=None):
+    return time_series_figure(history_points(history, 0, end))
+
 
+# the time series from {series: (steps, values)}
+def time_series_figure(points):
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=steps, y=infected, mode='lines', name='Infected', line=dict(color='red')))
-    fig.add_trace(go.Scatter(x=steps, y=recovered, mode='lines', name='Recovered', line=dict(color='green')))
-    fig.add_trace(go.Scatter(x=steps, y=vaccinated, mode='lines', name='Vaccinated', line=dict(color='blue')))
+    fig.add_trace(go.Scatter(x=points["infected"][0], y=points["infected"][1], mode='lines', name='Infected', line=dict(color='red')))
+    fig.add_trace(go.Scatter(x=points["recovered"][0], y=points["recovered"][1], mode='lines', name='Recovered', line=dict(color='green')))
+    fig.add_trace(go.Scatter(x=points["vaccinated"][0], y=points["vaccinated"][1], mode='lines', name='Vaccinated', line=dict(color='blue')))
 
     fig.update_layout(
         template="plotly_dark",
@@ -169,114 +133,328 @@ def create_time_series(history):
     )
     return fig
 
-# set up initial simulation
-people = initialize_simulation()
 
-# layout for the page
-layout = html.Div([
-    html.H2("R0 value simulation"),
-    html.Div([
-        # left side shows the graph
-        dcc.Graph(id='pandemic-graph-page2', style={"flex": "3"}),
+# compartmental engine: infected over time for every R0 on the slider, solved
+# as one batch, with the selected R0 highlighted. Every few steps is plenty
+# for these smooth curves
+def create_compartmental_figure(solution, r0_values, selected, population):
+    stride = max(1, len(solution["step"]) // 300)
+    fig = go.Figure(layout=dict(template="plotly_dark"))
+    for i, r0 in enumerate(r0_values):
+        chosen = i == selected
+        fig.add_trace(go.Scatter(
+            x=solution["step"][::stride], y=np.round(solution["infected"][i, ::stride], 1), mode='lines',
+            name=f"R0 = {r0:.1f}", showlegend=chosen,
+            line=dict(color='red' if chosen else 'grey', width=3 if chosen else 1),
+            opacity=1 if chosen else 0.4
+        ))
+    fig.update_layout(
+        title=f"Infected over time for R0 0.5 to 3.0, Population = {population:,}",
+        xaxis_title="Time Step",
+        yaxis_title="Infected",
+        width=800,
+        height=800
+    )
+    return fig
 
-        # right side has the controls
-        html.Div([
-            html.P("R0 value:"),
-            dcc.Slider(
-                id='r0-slider',
-                min=0.5,
-                max=3.0,
-                step=0.1,
-                value=1.5,
-                marks={i: str(i) for i in np.arange(0.5, 3.1, 0.5)}
-            ),
-            html.P("Population"),
-            dcc.Slider(
-                id='num-people-slider',
-                min=10,
-                max=250,
-                step=10,
-                value=num_people,
-                marks={i: str(i) for i in range(10, 251, 40)}
-            ),
-            html.P("Percentage vaccinated"),
-            dcc.Slider(
-                id='vaccination-slider',
-                min=0,
-                max=90,
-                step=10,
-                value=0,
-                marks={i: f"{i}%" for i in range(0, 91, 10)}
+# final attack rate against R0, one line per vaccination level, for the swept
+# population closest to the one selected. The bars go from the 10th to the
+# 90th percentile of the runs
+def create_sweep_figure(population):
+    fig = go.Figure()
+    fig.update_layout(
+        template="plotly_dark",
+        margin=dict(t=40, b=20),
+        height=400,
+        xaxis_title="R0",
+        yaxis_title="Share of unvaccinated people infected",
+        yaxis=dict(range=[0, 1.05], tickformat=".0%"),
+    )
+    if sweep is None:
+        fig.update_layout(title="No sweep results yet, run python -m simulation.sweep")
+        return fig
+
+    populations = sweep["population"].unique()
+    nearest = populations[np.abs(populations - population).argmin()]
+    rows = sweep[sweep["population"] == nearest]
+    for vaccination, group in rows.groupby("vaccination_percentage"):
+        group = group.sort_values("r0")
+        fig.add_trace(go.Scatter(
+            x=group["r0"], y=group["attack_rate_median"], mode="lines+markers", name=f"{vaccination}% vaccinated",
+            error_y=dict(
+                type="data", symmetric=False,
+                array=group["attack_rate_p90"] - group["attack_rate_median"],
+                arrayminus=group["attack_rate_median"] - group["attack_rate_p10"],
             ),
-            html.Div(id='counter-display-page2', style={"margin-top": "10px", "font-size": "16px"}),
-            html.Button('Restart Simulation', id='restart-button', n_clicks=0),
-        ], style={"flex": "1", "padding": "10px"}),
-    ], style={"display": "flex", "flex-direction": "row"}),
+        ))
+    fig.update_layout(title=f"Outbreak size over {int(rows['replicates'].min())} runs per point, population {nearest}")
+    return fig
 
-    # this handles the frame updates
-    dcc.Interval(
-        id='interval-page2',
-        interval=100,
-        n_intervals=0
-    ),
-    dcc.Graph(id='time-series-graph', style={"margin-top": "20px"})
 
-])
+# layout for the page, a function so each page load gets a new session id.
+# The id is kept in session storage so it survives navigating between pages
+def layout():
+    return html.Div([
+        dcc.Store(id='session-id-page2', storage_type='session', data=str(uuid.uuid4())),
+        # a new id per page load, so the first tick after one sends full figures
+        dcc.Store(id='view-id-page2', data=str(uuid.uuid4())),
+        html.H2("R0 value simulation"),
+        html.Div([
+            # left side shows the graph
+            dcc.Graph(id='pandemic-graph-page2', style={"flex": "3"}),
+
+            # right side has the controls
+            html.Div([
+                html.P("R0 value:"),
+                dcc.Slider(
+                    id='r0-slider',
+                    min=0.5,
+                    max=3.0,
+                    step=0.1,
+                    value=1.5,
+                    marks={i: str(i) for i in np.arange(0.5, 3.1, 0.5)}
+                ),
+                html.P("Population"),
+                dcc.Slider(
+                    id='num-people-slider',
+                    min=10,
+                    max=2000,
+                    step=10,
+                    value=num_people,
+                    marks={i: str(i) for i in [10, 250, 500, 1000, 1500, 2000]}
+                ),
+                html.P("Percentage vaccinated"),
+                dcc.Slider(
+                    id='vaccination-slider',
+                    min=0,
+                    max=90,
+                    step=10,
+                    value=0,
+                    marks={i: f"{i}%" for i in range(0, 91, 10)}
+                ),
+                html.P("Run the simulation"),
+                dcc.RadioItems(
+                    id='engine-page2',
+                    options=[
+                        {"label": " on the server", "value": "server"},
+                        {"label": " in the browser", "value": "browser"},
+                        {"label": " as an SIR model", "value": "compartmental"},
+                    ],
+                    value="server",
+                    inline=True,
+                    inputStyle={"margin-left": "10px"}
+                ),
+                html.P("Population for the SIR model"),
+                dcc.Input(id='compartmental-population', type='number', min=10, step=1, value=1_000_000),
+                html.P("Seed, used from the next restart (empty for a random one)"),
+                dcc.Input(id='seed-page2', type='number', min=0, max=2**32 - 1, step=1, placeholder="random"),
+                html.Div(id='counter-display-page2', style={"margin-top": "10px", "font-size": "16px"}),
+                html.Button('Restart Simulation', id='restart-button', n_clicks=0),
+            ], style={"flex": "1", "padding": "10px"}),
+        ], style={"display": "flex", "flex-direction": "row"}),
+
+        # this handles the frame updates, one interval per engine and only
+        # the selected one runs
+        dcc.Interval(
+            id='interval-page2',
+            interval=100,
+            n_intervals=0
+        ),
+        dcc.Interval(
+            id='interval-page2-client',
+            interval=100,
+            n_intervals=0,
+            disabled=True
+        ),
+        # parameters and seed for the in-browser engine (assets/page2_simulation.js)
+        dcc.Store(id='client-sim-page2'),
+        # true once nobody is infected, set by whichever engine is running
+        dcc.Store(id='steady-page2', data=False),
+        dcc.Graph(id='time-series-graph', style={"margin-top": "20px"}),
+        dcc.Graph(id='sweep-graph', style={"margin-top": "20px"})
 
-# keep track of the restart state
-last_restart_clicks = 0
+    ])
 
 # this updates the graph and the counters as time passes or when settings change
 @dash.callback(
-    [Output("pandemic-graph-page2", "figure"), Output("counter-display-page2", "children"), Output("time-series-graph", "figure")],
+    [Output("pandemic-graph-page2", "figure"), Output("counter-display-page2", "children"),
+     Output("time-series-graph", "figure"), Output("time-series-graph", "extendData"),
+     Output("steady-page2", "data")],
     [Input("r0-slider", "value"), Input("interval-page2", "n_intervals"), Input("restart-button", "n_clicks")],
-    [State("num-people-slider", "value"), State("vaccination-slider", "value")],
+    [State("num-people-slider", "value"), State("vaccination-slider", "value"),
+     State("session-id-page2", "data"), State("view-id-page2", "data"), State("engine-page2", "value"),
+     State("seed-page2", "value")],
+    prevent_initial_call=True
+)
+def update_graph(r0, n_intervals, restart_clicks, num_people_value, vaccination_percentage, session_id, view_id, engine,
+                 seed_value):
+    if engine != "server":
+        raise PreventUpdate
+
+    session = get_session(session_id)
+    if session is None:
+        # first tick for this tab, or its session was evicted
+        session = new_session(num_people_value, vaccination_percentage, restart_clicks, run_seed(seed_value))
+        session["last_n_intervals"] = n_intervals
+        save_session(session_id, session)
+
+    with session["lock"]:
+        # reinitialize simulation if restart was clicked or population changed
+        if restart_clicks != session["last_restart_clicks"] or session["num_people"] != num_people_value:
+            # reset in place so the session keeps the lock we're holding
+            fresh = new_session(num_people_value, vaccination_percentage, restart_clicks, run_seed(seed_value))
+            del fresh["lock"]
+            session.update(fresh)
+            session["last_n_intervals"] = n_intervals
+            save_session(session_id, session)  # population may have changed, recheck the caps
+
+        history = session["history"]
+        people = session["people"]
+
+        # one step per tick, more if ticks were missed since the last callback
+        steps = min(max(n_intervals - session["last_n_intervals"], 1), max_steps_per_tick)
+        session["last_n_intervals"] = n_intervals
+
+        merged = False
+        for _ in range(steps):
+            # update people's positions and infection state
+            people = update_simulation(people, r0, rng=session["rng"])
+
+            # count how many are in each category and add it to the history,
+            # steps count from the last restart
+            counts = count_states(people)
+            merged |= append_history(history, session["step"], counts)
+            session["step"] += 1
+
+        counter_text = (f"Infected: {counts['infected']}, Recovered: {counts['recovered']}, "
+                        f"Vaccinated: {counts['vaccinated']}, Seed: {session['seed']}")
+
+        # full figures after a restart or for a page that doesn't have them yet,
+        # and the whole time series again if the history buckets were merged
+        # nothing changes any more once nobody is infected, the tick
+        # scheduler stops the interval until the next restart or settings change
+        steady = counts["infected"] == 0
+
+        # the last bucket is still filling up and normally waits until it's
+        # complete, but once steady no more ticks come to complete it, so it's
+        # sent as it is (the counts can't change any more after that)
+        sent, complete = session["sent_buckets"], history["size"] if steady else complete_buckets(history)
+        session["sent_buckets"] = complete
+        if session["view_id"] != view_id:
+            session["view_id"] = view_id
+            return create_figure(people, r0), counter_text, create_time_series(history, complete), no_update, steady
+        if merged:
+            return scatter_patch(people, r0), counter_text, create_time_series(history, complete), no_update, steady
+        if complete > sent:
+            return scatter_patch(people, r0), counter_text, no_update, time_series_points(history, sent, complete), steady
+        return scatter_patch(people, r0), counter_text, no_update, no_update, steady
+
+
+
+# only the selected engine's interval runs, and only while the epidemic is
+# still going (see assets/tick_scheduler.js, which also stops it in hidden
+# tabs). Touching any control starts it again. Switching engines also makes a
+# new view id, so the server sends full figures again when it takes over
+dash.clientside_callback(
+    """
+    function(engine, steady, restart_clicks, num_people, vaccination) {
+        var triggered = window.dash_clientside.callback_context.triggered.map(function(t) { return t.prop_id; });
+        var interacted = triggered.some(function(id) { return id !== 'steady-page2.data' && id !== '.'; });
+        var running = interacted || !steady;
+        var scheduler = window.tickScheduler;
+        return [
+            scheduler.gate('interval-page2', engine === 'server' && running),
+            scheduler.gate('interval-page2-client', engine === 'browser' && running),
+            triggered.indexOf('engine-page2.value') !== -1 ? Math.random().toString(36).slice(2) : window.dash_clientside.no_update
+        ];
+    }
+    """,
+    Output("interval-page2", "disabled"),
+    Output("interval-page2-client", "disabled"),
+    Output("view-id-page2", "data"),
+    Input("engine-page2", "value"),
+    Input("steady-page2", "data"),
+    Input("restart-button", "n_clicks"),
+    Input("num-people-slider", "value"),
+    Input("vaccination-slider", "value")
+)
+
+
+# in-browser mode: the server only picks the parameters and a seed and sends
+# empty figures for the browser to draw into
+@dash.callback(
+    [Output("client-sim-page2", "data"),
+     Output("pandemic-graph-page2", "figure", allow_duplicate=True),
+     Output("time-series-graph", "figure", allow_duplicate=True)],
+    [Input("engine-page2", "value"), Input("restart-button", "n_clicks"),
+     Input("num-people-slider", "value"), Input("vaccination-slider", "value")],
+    [State("r0-slider", "value"), State("seed-page2", "value")],
+    prevent_initial_call=True
+)
+def start_client_simulation(engine, restart_clicks, num_people_value, vaccination_percentage, r0, seed_value):
+    if engine != "browser":
+        raise PreventUpdate
+    params = {
+        "num_people": num_people_value,
+        "vaccination_percentage": vaccination_percentage,
+        "seed": run_seed(seed_value),
+        # tells the browser to start over even when the seed is the same
+        "run_id": uuid.uuid4().hex,
+        "width": width,
+        "height": height,
+        "infection_radius": infection_radius,
+        "duration": duration,
+        "speed": speed,
+    }
+    return params, create_figure(initialize_simulation(0), r0), create_time_series(new_history())
+
+
+dash.clientside_callback(
+    ClientsideFunction(namespace="page2", function_name="step"),
+    Output("pandemic-graph-page2", "figure", allow_duplicate=True),
+    Output("counter-display-page2", "children", allow_duplicate=True),
+    Output("time-series-graph", "figure", allow_duplicate=True),
+    Output("steady-page2", "data", allow_duplicate=True),
+    Input("interval-page2-client", "n_intervals"),
+    Input("r0-slider", "value"),
+    Input("client-sim-page2", "data"),
+    State("pandemic-graph-page2", "figure"),
+    State("time-series-graph", "figure"),
+    prevent_initial_call=True
+)
+
+
+# compartmental engine: solves every R0 on the slider at once (milliseconds,
+# whatever the population) and plots the selected one as the time series
+@dash.callback(
+    [Output("pandemic-graph-page2", "figure", allow_duplicate=True),
+     Output("counter-display-page2", "children", allow_duplicate=True),
+     Output("time-series-graph", "figure", allow_duplicate=True)],
+    [Input("engine-page2", "value"), Input("r0-slider", "value"), Input("vaccination-slider", "value"),
+     Input("compartmental-population", "value"), Input("restart-button", "n_clicks")],
     prevent_initial_call=True
 )
-def update_graph(r0, n_intervals, restart_clicks, num_people_value, vaccination_percentage):
-    global people, last_restart_clicks, num_people, history
-
-    # reinitialize simulation if restart was clicked or population changed
-    if restart_clicks != last_restart_clicks or num_people != num_people_value:
-        num_people = num_people_value
-        people = initialize_simulation(vaccination_percentage=vaccination_percentage)
-        last_restart_clicks = restart_clicks
-        
-        # Reset the history and time step when the simulation restarts
-        history.clear()
-        history.append({
-            "step": 0,
-            "infected": 0,
-            "recovered": 0,
-            "vaccinated": 0
-        })
-        n_intervals = 0  # reset the time step to 0
-
-    # update people's positions and infection state
-    people = update_simulation(people, r0)
-
-    # count how many are in each category
-    infected_count = sum(1 for person in people if person["infected"])
-    recovered_count = sum(1 for person in people if person["recovered"])
-    vaccinated_count = sum(1 for person in people if person["vaccinated"])
-
-    # append to history
-    if n_intervals == 0 or (restart_clicks != last_restart_clicks or num_people != num_people_value):
-        history.clear()  # reset history if restarting
-        history.append({
-            "step": 0,
-            "infected": infected_count,
-            "recovered": recovered_count,
-            "vaccinated": vaccinated_count
-        })
-    else:
-        history.append({
-            "step": n_intervals,
-            "infected": infected_count,
-            "recovered": recovered_count,
-            "vaccinated": vaccinated_count
-        })
-
-    counter_text = f"Infected: {infected_count}, Recovered: {recovered_count}, Vaccinated: {vaccinated_count}"
-
-    return create_figure(people, r0), counter_text, create_time_series(history)
\ No newline at end of file
+def update_compartmental(engine, r0, vaccination_percentage, population, restart_clicks):
+    if engine != "compartmental" or not population:
+        raise PreventUpdate
+
+    r0_values = np.round(np.arange(0.5, 3.01, 0.1), 1)
+    selected = int(np.abs(r0_values - r0).argmin())
+    r0_values[selected] = r0
+    solution = solve_compartmental(r0_values, vaccination_percentage, population)
+
+    infected = solution["infected"][selected]
+    peak = int(infected.argmax())
+    points = {
+        name: (solution["step"].tolist(), np.round(solution[name][selected], 1).tolist())
+        for name in series
+    }
+    counter_text = (
+        f"Peak infected: {infected[peak]:,.0f} at step {solution['step'][peak]:.0f}, "
+        f"Recovered: {solution['recovered'][selected, -1]:,.0f}, Vaccinated: {solution['vaccinated'][selected, 0]:,.0f}"
+    )
+    return create_compartmental_figure(solution, r0_values, selected, population), counter_text, time_series_figure(points)
+
+@dash.callback(Output("sweep-graph", "figure"), Input("num-people-slider", "value"))
+def update_sweep_graph(population):
+    return create_sweep_figure(population)
@@ -1,56 +1,48 @@
 # page3.py
 import dash
-from dash import html, dcc, Input, Output, State, callback, no_update
-import plotly.express as px
-import pandas as pd
-import json
-import os
+from dash import html, dcc, Input, Output, State, callback, no_update, Patch, ClientsideFunction
+import numpy as np
+import base64
+from functools import lru_cache
+from maps.measures import (
+    measures, unique_dates, countries, date_positions, TEXT_COLOR,
+    map_frame, map_title, create_map,
+)
 
 dash.register_page(__name__, path="/page3")
 
-# Ensure JSON file exists
-json_path = os.path.join("data", "government_measures.json")
-if not os.path.exists(json_path):
-    raise FileNotFoundError(f"Error: {json_path} not found!")
-
-with open(json_path, "r") as file:
-    data = json.load(file)
-
-df = pd.DataFrame(data)
-df["date"] = pd.to_datetime(df["date"])
-unique_dates = sorted(df["date"].dt.strftime("%Y-%m-%d").unique())
-
-TEXT_COLOR = "#00FFC6"  # override CSS
-
-# initial map
-def create_map(date_selected):
-    df_filtered = df[df["date"] == date_selected]
-    fig = px.choropleth(
-        df_filtered,
-        locations="iso_a3",
-        color="normalized_measures",
-        hover_name="iso_a3",
-        color_continuous_scale="Reds",
-        projection="natural earth",
-        title=f"Level of COVID-19 measures, circa {date_selected}",
-    )
-    fig.update_layout(
-        margin={"r": 0, "t": 50, "l": 0, "b": 0},
-        geo=dict(showcoastlines=True, showland=True),
-        plot_bgcolor="rgba(0, 0, 0, 0)",
-        paper_bgcolor="rgba(0, 0, 0, 0)",  # Ensure transparency
-        title=dict(font=dict(color=TEXT_COLOR)),
-        coloraxis_colorbar=dict(
-            title="Level of Measures",
-            title_font=dict(color=TEXT_COLOR),
-            tickfont=dict(color="#A9A9A9"),
-            bgcolor="rgba(0, 0, 0, 0)",
-            outlinecolor="#333333",
-        ),
-        width=1400,
-        height=700,
-    )
-    return fig
+# the whole matrix for browser-side playback (assets/page3_playback.js), as
+# uint16 between the lowest and highest value with 65535 for no record, so
+# 989 dates x 151 countries is ~400KB of base64
+missing_value = 65535
+
+
+@lru_cache(maxsize=1)
+def measures_payload():
+    matrix = np.asarray(measures, dtype=np.float64)
+    missing = np.isnan(matrix)
+    lo, hi = float(np.nanmin(matrix)), float(np.nanmax(matrix))
+    scaled = np.round((matrix - lo) / ((hi - lo) or 1) * (missing_value - 1))
+    values = np.where(missing, missing_value, scaled).astype("<u2")
+    return {
+        "dates": list(unique_dates),
+        "countries": countries.tolist(),
+        "lo": lo,
+        "hi": hi if hi > lo else lo + 1,
+        "values": base64.b64encode(values.tobytes()).decode("ascii"),
+    }
+
+
+# everything after the first map only swaps the trace data and the title, the
+# geo layout (and with it the user's zoom) stays as it is in the browser
+def map_patch(date_selected):
+    locations, values = map_frame(date_positions[date_selected])
+    patch = Patch()
+    patch["data"][0]["locations"] = locations
+    patch["data"][0]["hovertext"] = locations
+    patch["data"][0]["z"] = values
+    patch["layout"]["title"]["text"] = map_title(date_selected)
+    return patch
 
 # layout
 layout = html.Div([
@@ -85,15 +77,38 @@ layout = html.Div([
                 tooltip={"placement": "bottom", "always_visible": False},
             )
         ], style={"width": "300px", "display": "inline-block", "marginLeft": "10px", "background": "transparent"}),
+        # browser playback downloads the data once, server playback asks for every frame
+        dcc.RadioItems(
+            id="playback-mode-page3",
+            options=[
+                {"label": " Play in the browser", "value": "browser"},
+                {"label": " Play on the server", "value": "server"},
+            ],
+            value="browser",
+            inline=True,
+            inputStyle={"marginLeft": "20px"},
+            style={"display": "inline-block", "color": TEXT_COLOR},
+        ),
     ], style={"marginTop": "20px", "background": "transparent", "textAlign": "center"}),  # Center the controls
 
-    # interval for auto-play
+    # interval for auto-play, only runs while playing (and the tab is visible,
+    # see assets/tick_scheduler.js)
     dcc.Interval(
         id="interval-component-page3",
         interval=500,
         n_intervals=0,
         disabled=True,
     ),
+    dcc.Interval(
+        id="interval-page3-client",
+        interval=500,
+        n_intervals=0,
+        disabled=True,
+    ),
+    dcc.Store(id="playing-page3", data=False),
+    dcc.Store(id="measures-page3"),
+    # slider positions the server has to draw (server mode, or before the data is in)
+    dcc.Store(id="map-request-page3"),
 
     # Graph to display the map
     dcc.Graph(
@@ -110,26 +125,45 @@ layout = html.Div([
     "alignItems": "center"  # Center elements horizontally
 })
 
-# Update Map when Slider changes
+# Update Map when Slider changes: drawn in the browser when it has the data,
+# otherwise passed on to update_map
+dash.clientside_callback(
+    ClientsideFunction(namespace="page3", function_name="route"),
+    Output("covid-map-page3", "figure", allow_duplicate=True),
+    Output("map-request-page3", "data"),
+    Input("date-slider-page3", "value"),
+    State("playback-mode-page3", "value"),
+    State("measures-page3", "data"),
+    State("covid-map-page3", "figure"),
+    prevent_initial_call=True
+)
+
+
 @dash.callback(
     Output("covid-map-page3", "figure"),
-    Input("date-slider-page3", "value"),
-    State("covid-map-page3", "relayoutData")
+    Input("map-request-page3", "data"),
+    prevent_initial_call=True
 )
-def update_map(selected_index, relayout_data):
-    selected_date = unique_dates[selected_index]
-    fig = create_map(selected_date)
+def update_map(selected_index):
+    return map_patch(unique_dates[selected_index])
 
-    if relayout_data:
-        fig.update_layout(**relayout_data)
 
-    return fig
+# one download of the whole matrix when browser playback is selected
+@dash.callback(
+    Output("measures-page3", "data"),
+    Input("playback-mode-page3", "value")
+)
+def load_measures(mode):
+    if mode != "browser":
+        return no_update
+    return measures_payload()
 
 # Unified Callback: Play/Pause Toggle AND Speed Change
 @callback(
     Output("play-pause-button-page3", "children", allow_duplicate=True),
-    Output("interval-component-page3", "disabled", allow_duplicate=True),
+    Output("playing-page3", "data"),
     Output("interval-component-page3", "interval", allow_duplicate=True),
+    Output("interval-page3-client", "interval"),
     Input("play-pause-button-page3", "n_clicks"),
     Input("playback-speed-page3", "value"),
     State("interval-component-page3", "disabled"),
@@ -145,12 +179,39 @@ def toggle_play_pause_and_speed(n_clicks, playback_speed, interval_disabled):
 
     if trigger_id == "play-pause-button-page3":
         if n_clicks % 2 == 1:  # Play
-            return "Pause", False, 500 / playback_speed
+            return "Pause", True, 500 / playback_speed, 500 / playback_speed
         else:  # Pause
-            return "Play", True, 500 / playback_speed
+            return "Play", False, 500 / playback_speed, 500 / playback_speed
 
     elif trigger_id == "playback-speed-page3":
-        return no_update, no_update, 500 / playback_speed
+        return no_update, no_update, 500 / playback_speed, 500 / playback_speed
+
+# the scheduler decides if the interval for the selected mode actually runs
+dash.clientside_callback(
+    """
+    function(playing, mode) {
+        var scheduler = window.tickScheduler;
+        return [
+            scheduler.gate('interval-component-page3', playing && mode !== 'browser'),
+            scheduler.gate('interval-page3-client', playing && mode === 'browser')
+        ];
+    }
+    """,
+    Output("interval-component-page3", "disabled"),
+    Output("interval-page3-client", "disabled"),
+    Input("playing-page3", "data"),
+    Input("playback-mode-page3", "value")
+)
+
+# browser playback moves the slider locally
+dash.clientside_callback(
+    ClientsideFunction(namespace="page3", function_name="advance"),
+    Output("date-slider-page3", "value", allow_duplicate=True),
+    Input("interval-page3-client", "n_intervals"),
+    State("date-slider-page3", "value"),
+    State("date-slider-page3", "max"),
+    prevent_initial_call=True
+)
 
 # Update Slider Automatically with Interval
 @dash.callback(
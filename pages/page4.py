@@ -1,12 +1,18 @@
 import dash
 from dash import html, dcc, Input, Output, callback, dash_table
+import json
 import pandas as pd
 import numpy as np
+import plotly
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from preProcessing.datastore import load_table, table_source, cached_json
 
 dash.register_page(__name__, path="/page4")
 
-df = pd.read_csv("data/health_stats_countries_final_actual.csv")
+data_path = "data/health_stats_countries_final_actual.csv"
+df = load_table(data_path)
 metrics = [
     "life_expectancy", "smoking_prevalence", "diabetes_prevalence",
     "infant_mortality_rate", "adult_male_mortality_rate", "adult_female_mortality_rate",
@@ -15,7 +21,150 @@ metrics = [
     "health_expenditure_usd", "out_of_pocket_health_expenditure_usd"
 ]
 df[metrics] = df[metrics].apply(lambda col: pd.to_numeric(col, errors='coerce'))
+df[metrics] = df[metrics].replace(77777, np.nan)  # 77777 marks a missing value
 
+# "binned": the server bins the values and sends the bar heights and the box
+# plot's five numbers, so the chart's size doesn't grow with the rows.
+# "raw": every value goes to the browser and plotly bins it there
+distribution_mode = "binned"
+distribution_bins = 30
+
+
+def metric_label(metric):
+    return metric.replace('_', ' ').title()
+
+
+def create_choropleth(metric):
+    fig = px.choropleth(
+        df,
+        locations="country_name",
+        locationmode="country names",
+        color=metric,
+        hover_name="country_name",
+        projection="natural earth",
+        title=f"Global {metric_label(metric)}",
+        color_continuous_scale="Viridis"
+    )
+    fig.update_traces(marker_line_color='white')
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        geo=dict(
+            showframe=False,
+            showcoastlines=False,
+            bgcolor='rgba(0,0,0,0)'
+        ),
+        coloraxis_colorbar=dict(title=metric_label(metric)),
+        title_font=dict(color='white')
+    )
+    return fig
+
+
+def style_distribution(dist_fig, metric):
+    dist_fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='white',
+        title_font=dict(color='white'),
+        xaxis_title=metric_label(metric),
+        yaxis_title="Count"
+    )
+    return dist_fig
+
+
+# Distribution chart (Histogram)
+def create_distribution(valid_data, metric):
+    dist_fig = px.histogram(
+        valid_data,
+        x=metric,
+        nbins=distribution_bins,
+        title=f"Distribution of {metric_label(metric)}",
+        marginal="box",
+        opacity=0.75
+    )
+    return style_distribution(dist_fig, metric)
+
+
+# about nbins equal bins on round edges (1, 2 or 5 times a power of ten),
+# like plotly picks them in the browser
+def histogram_bins(values, nbins=distribution_bins):
+    lo, hi = values.min(), values.max()
+    rough = (hi - lo) / nbins or 1.0
+    magnitude = 10 ** np.floor(np.log10(rough))
+    size = magnitude * next(step for step in (1, 2, 5, 10) if step * magnitude >= rough)
+    start = np.floor(lo / size) * size
+    edges = start + size * np.arange(int(np.floor((hi - start) / size)) + 2)
+    counts, edges = np.histogram(values, bins=edges)
+    return edges, counts
+
+
+# the same chart as create_distribution from aggregates only: bars for the
+# bin counts and a box drawn from min, quartiles and max
+def create_binned_distribution(values, metric):
+    edges, counts = histogram_bins(values)
+    low, q1, median, q3, high = np.percentile(values, [0, 25, 50, 75, 100])
+    label = metric_label(metric)
+
+    dist_fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    dist_fig.add_trace(go.Box(
+        q1=[q1], median=[median], q3=[q3], lowerfence=[low], upperfence=[high],
+        mean=[values.mean()], orientation="h", name=label, showlegend=False, hoverinfo="x",
+    ), row=1, col=1)
+    dist_fig.add_trace(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), opacity=0.75,
+        customdata=np.stack([edges[:-1], edges[1:]], axis=1), showlegend=False,
+        hovertemplate="%{customdata[0]:,.4g} - %{customdata[1]:,.4g}<br>Count: %{y}<extra></extra>",
+    ), row=2, col=1)
+    dist_fig.update_traces(marker_color="#636efa")
+    dist_fig.update_yaxes(showticklabels=False, row=1, col=1)
+    dist_fig.update_layout(title=f"Distribution of {label}", bargap=0)
+    style_distribution(dist_fig, metric)
+    return dist_fig.update_layout(xaxis_title=None, xaxis2_title=label, yaxis_title=None, yaxis2_title="Count")
+
+
+def table_rows(names, values):
+    return [{"country": name, "value": f"{value:,.2f}"} for name, value in zip(names, values)]
+
+
+# everything the page shows for one metric: both figures, the top/bottom 5
+# tables and the numbers for the stats panel
+def metric_results(metric):
+    valid_data = df[["country_name", metric]].dropna()
+    names = valid_data["country_name"].astype(str).to_numpy()
+    values = valid_data[metric].to_numpy(dtype=float)
+    if not len(values):
+        # no country has a value, there's nothing to rank or bin
+        empty = style_distribution(go.Figure(layout=dict(title=f"Distribution of {metric_label(metric)}")), metric)
+        return {"choropleth": create_choropleth(metric), "top5": [], "bottom5": [], "stats": None, "distribution": empty}
+    # the same sorts the page always used, so tied values keep their old order
+    sorted_data = valid_data.sort_values(by=metric)
+    bottom5 = sorted_data.head(5)
+    top5 = sorted_data.tail(5).sort_values(by=metric, ascending=False)
+    highest, lowest = int(np.argmax(values)), int(np.argmin(values))
+    return {
+        "choropleth": create_choropleth(metric),
+        "top5": table_rows(top5["country_name"].astype(str), top5[metric]),
+        "bottom5": table_rows(bottom5["country_name"].astype(str), bottom5[metric]),
+        "stats": {
+            "mean": values.mean(),
+            "median": float(np.median(values)),
+            "count": len(values),
+            "max": [names[highest], values[highest]],
+            "min": [names[lowest], values[lowest]],
+        },
+        "distribution": (create_binned_distribution(values, metric) if distribution_mode == "binned"
+                         else create_distribution(valid_data, metric)),
+    }
+
+
+# the data is static, so every metric's results are built once and cached on
+# disk, keyed by the data file; a dropdown change is then only a lookup
+results = cached_json(
+    'page4_metrics',
+    table_source(data_path),
+    {'metrics': metrics, 'plotly': plotly.__version__, 'distribution': [distribution_mode, distribution_bins]},
+    lambda: json.dumps({metric: metric_results(metric) for metric in metrics}, cls=plotly.utils.PlotlyJSONEncoder)
+)
 
 
 # Layout with chart + two separate tables
@@ -93,80 +242,20 @@ def layout():
     Input("metric-dropdown", "value")
 )
 def update_choropleth(selected_metric):
-    df_plot = df.copy()
-    df_plot[selected_metric] = df_plot[selected_metric].replace(77777, np.nan)
-
-    # Choropleth
-    fig = px.choropleth(
-        df_plot,
-        locations="country_name",
-        locationmode="country names",
-        color=selected_metric,
-        hover_name="country_name",
-        projection="natural earth",
-        title=f"Global {selected_metric.replace('_', ' ').title()}",
-        color_continuous_scale="Viridis"
-    )
-    fig.update_traces(marker_line_color='white')
-    fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        geo=dict(
-            showframe=False,
-            showcoastlines=False,
-            bgcolor='rgba(0,0,0,0)'
-        ),
-        coloraxis_colorbar=dict(title=selected_metric.replace('_', ' ').title()),
-        title_font=dict(color='white')
-    )
-
-    # Top and Bottom 5
-    sorted_df = df_plot[["country_name", selected_metric]].dropna().sort_values(by=selected_metric)
-    bottom5_df = sorted_df.head(5)
-    top5_df = sorted_df.tail(5).sort_values(by=selected_metric, ascending=False)
-
-    top5_data = [{
-        "country": f"{row['country_name']}",
-        "value": f"{row[selected_metric]:,.2f}"
-    } for _, row in top5_df.iterrows()]
-
-    bottom5_data = [{
-        "country": f"{row['country_name']}",
-        "value": f"{row[selected_metric]:,.2f}"
-    } for _, row in bottom5_df.iterrows()]
-
-    valid_data = df_plot[["country_name", selected_metric]].dropna()
-    mean_val = valid_data[selected_metric].mean()
-    median_val = valid_data[selected_metric].median()
-    count_val = valid_data[selected_metric].count()
-    max_row = valid_data.loc[valid_data[selected_metric].idxmax()]
-    min_row = valid_data.loc[valid_data[selected_metric].idxmin()]
-
+    result = results[selected_metric]
+    stats = result["stats"]
+    if stats is None:
+        stats_panel = html.Div([
+            html.H4(f"Global Statistics for {metric_label(selected_metric)}"),
+            html.P("No countries have data for this metric"),
+        ])
+        return result["choropleth"], result["top5"], result["bottom5"], stats_panel, result["distribution"]
     stats_panel = html.Div([
-        html.H4(f"Global Statistics for {selected_metric.replace('_', ' ').title()}"),
-        html.P(f"Mean: {mean_val:,.2f}"),
-        html.P(f"Median: {median_val:,.2f}"),
-        html.P(f"Countries with Data: {count_val}"),
-        html.P(f"Maximum: {max_row['country_name']} ({max_row[selected_metric]:,.2f})"),
-        html.P(f"Minimum: {min_row['country_name']} ({min_row[selected_metric]:,.2f})"),
+        html.H4(f"Global Statistics for {metric_label(selected_metric)}"),
+        html.P(f"Mean: {stats['mean']:,.2f}"),
+        html.P(f"Median: {stats['median']:,.2f}"),
+        html.P(f"Countries with Data: {stats['count']}"),
+        html.P(f"Maximum: {stats['max'][0]} ({stats['max'][1]:,.2f})"),
+        html.P(f"Minimum: {stats['min'][0]} ({stats['min'][1]:,.2f})"),
     ])
-
-        # Distribution chart (Histogram)
-    dist_fig = px.histogram(
-        valid_data,
-        x=selected_metric,
-        nbins=30,
-        title=f"Distribution of {selected_metric.replace('_', ' ').title()}",
-        marginal="box",
-        opacity=0.75
-    )
-    dist_fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font_color='white',
-        title_font=dict(color='white'),
-        xaxis_title=selected_metric.replace('_', ' ').title(),
-        yaxis_title="Count"
-    )
-
-    return fig, top5_data, bottom5_data, stats_panel, dist_fig
+    return result["choropleth"], result["top5"], result["bottom5"], stats_panel, result["distribution"]
@@ -0,0 +1,88 @@
+import os
+from importlib.metadata import version
+
+import pandas as pd
+import pycountry
+from pycountry_convert import country_alpha2_to_continent_code
+
+# Mapping continent codes to continent names
+continent_map = {
+    'AF': 'Africa',
+    'AN': 'Antarctica',
+    'AS': 'Asia',
+    'EU': 'Europe',
+    'NA': 'North America',
+    'OC': 'Oceania',
+    'SA': 'South America'
+}
+
+# the table only changes when pycountry does, so the version goes in the file name
+cache_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    f"country_table_pycountry-{version('pycountry')}.csv"
+)
+
+_country_table = None
+
+
+# build one row per country: alpha_2, alpha_3, name and continent
+def build_country_table():
+    rows = []
+    for country in pycountry.countries:
+        try:
+            continent = continent_map.get(country_alpha2_to_continent_code(country.alpha_2), 'Unknown')
+        except KeyError:
+            continent = 'Unknown'
+        rows.append({
+            'alpha_2': country.alpha_2,
+            'alpha_3': country.alpha_3,
+            'name': country.name,
+            'continent': continent
+        })
+    return pd.DataFrame(rows)
+
+
+# load the country table from the disk cache, building it the first time
+def load_country_table():
+    global _country_table
+    if _country_table is None:
+        if os.path.exists(cache_path):
+            # keep_default_na is off so Namibia's "NA" code isn't read as missing
+            _country_table = pd.read_csv(cache_path, dtype=str, keep_default_na=False)
+        else:
+            _country_table = build_country_table()
+            # write then rename, pipeline stages running in parallel may build it at the same time
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            _country_table.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, cache_path)
+    return _country_table
+
+
+# map a whole column through the table; only the distinct values are looked up,
+# and pycountry lookups are case insensitive so keys are lowercased on both sides
+def _lookup(values, key, column):
+    table = load_country_table()
+    mapping = pd.Series(table[column].values, index=table[key].str.lower())
+    mapping = mapping[~mapping.index.duplicated(keep='last')]
+
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:  # nothing but NaN, take() can't index an empty array
+        return pd.Series([None] * len(values), index=values.index, dtype=object)
+    resolved = pd.Index(uniques).astype(str).str.lower().map(mapping)
+    result = pd.Series(resolved.take(codes), index=values.index, dtype=object)
+    return result.where(codes != -1)
+
+
+# ISO alpha-2 codes -> country names (NaN when not a country)
+def names_from_alpha2(codes):
+    return _lookup(codes, 'alpha_2', 'name')
+
+
+# ISO alpha-2 codes -> ISO alpha-3 codes (NaN when not a country)
+def alpha3_from_alpha2(codes):
+    return _lookup(codes, 'alpha_2', 'alpha_3')
+
+
+# country names -> continent names ('Unknown' when the name isn't found)
+def continents_from_names(names):
+    return _lookup(names, 'name', 'continent').fillna('Unknown')
@@ -0,0 +1,172 @@
+import contextlib
+import glob
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# typed columnar copies of the data/ artifacts. The CSVs stay the source of
+# truth, each one gets a .parquet file next to it with the dtypes below so the
+# pages don't have to re-parse dates or hold the key columns as Python strings.
+
+# columns that only have a few hundred distinct values
+categorical_columns = ['location_key', 'continent', 'country_name', 'iso_a3', 'date_str']
+
+date_columns = ['date']
+
+# the vaccination percentages, GDP per capita and measure levels are fine at
+# float32. The health metrics stay float64, page4 shows them in tables and
+# summary stats where float32 rounding changes the printed values (52.805 ->
+# 52.81). Head counts and totals (population, cumulative_persons_fully_vaccinated,
+# gdp_usd) are left as float64 so they still print exactly in the tables.
+float32_columns = ['percent_vaccinated', 'gdp_per_capita_usd', 'normalized_measures']
+
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+# coerce the known columns to their declared dtypes, anything else is left alone
+def apply_dtypes(df):
+    df = df.copy()
+    for column in df.columns:
+        if column in date_columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif column in float32_columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+        elif column in categorical_columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+# write the CSV as before, plus the typed columnar copy when pyarrow is installed
+def write_table(df, csv_path):
+    df.to_csv(csv_path, index=False)
+    try:
+        apply_dtypes(df).to_parquet(columnar_path(csv_path), index=False)
+    except ImportError:
+        print(f"pyarrow not installed, only wrote {csv_path}")
+
+
+# which file load_table will read: the columnar copy unless the CSV is newer
+def table_source(csv_path):
+    parquet_path = columnar_path(csv_path)
+    if os.path.exists(parquet_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        try:
+            import pyarrow  # noqa: F401
+            return parquet_path
+        except ImportError:
+            pass
+    return csv_path
+
+
+# load a data/ artifact, preferring the columnar copy
+def load_table(csv_path):
+    source = table_source(csv_path)
+    if source.endswith('.parquet'):
+        return pd.read_parquet(source)
+    return apply_dtypes(pd.read_csv(source))
+
+
+# government measures as a dense (dates x countries) float32 matrix. The matrix
+# is saved as .npy so it can be memory-mapped and one date is one contiguous
+# row; the date and country indexes go in a small JSON file next to it.
+# Country/date pairs with no record are NaN.
+def matrix_paths(json_path):
+    stem = os.path.splitext(json_path)[0]
+    return stem + '.npy', stem + '_index.json'
+
+
+def measures_matrix(df_country):
+    pivot = df_country.pivot(index='date', columns='iso_a3', values='normalized_measures')
+    return pivot.to_numpy(dtype='float32'), list(pivot.index), list(pivot.columns)
+
+
+def write_matrix(df_country, json_path):
+    matrix, dates, countries = measures_matrix(df_country)
+    matrix_path, index_path = matrix_paths(json_path)
+    np.save(matrix_path, np.ascontiguousarray(matrix))
+    with open(index_path, 'w') as f:
+        json.dump({'dates': dates, 'countries': countries}, f)
+
+
+# load the matrix memory-mapped, or build it from the JSON records if it's missing or stale
+def load_matrix(json_path):
+    matrix_path, index_path = matrix_paths(json_path)
+    if os.path.exists(matrix_path) and os.path.exists(index_path) and (
+        not os.path.exists(json_path) or os.path.getmtime(matrix_path) >= os.path.getmtime(json_path)
+    ):
+        with open(index_path) as f:
+            index = json.load(f)
+        return np.load(matrix_path, mmap_mode='r'), index['dates'], index['countries']
+
+    with open(json_path) as f:
+        df_country = pd.DataFrame(json.load(f))
+    return measures_matrix(df_country)
+
+
+# results that are slow to build (figure JSON mostly) are cached in data/cache,
+# keyed by a hash of the data file they came from and the parameters used
+cache_dir = os.path.join('data', 'cache')
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# digest of the file a function is defined in, empty when it has none (builtins,
+# partials, code typed into the interpreter)
+def _source_digest(function):
+    try:
+        path = inspect.getsourcefile(function)
+    except TypeError:
+        return ''
+    return file_digest(path) if path and os.path.exists(path) else ''
+
+
+# return the cached JSON for name if the key matches, otherwise call build()
+# (which returns a JSON string), store the result and drop older entries. The
+# file build() is defined in is part of the key, so changing how the result is
+# built invalidates it too
+def cached_json(name, data_path, params, build):
+    key_source = file_digest(data_path) + _source_digest(build) + json.dumps(params, sort_keys=True, default=str)
+    key = hashlib.sha256(key_source.encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f'{name}-{key}.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+    result = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    for old_path in glob.glob(os.path.join(cache_dir, f'{name}-*.json')):
+        # another worker starting at the same time may have removed it already
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(old_path)
+    # write then rename so workers starting at the same time never see half a file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(result)
+    os.replace(tmp_path, path)
+    return json.loads(result)
+
+
+# convert existing files in place, e.g. python preProcessing/datastore.py data/*.csv data/*.json
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        if path.endswith('.json'):
+            with open(path) as f:
+                write_matrix(pd.DataFrame(json.load(f)), path)
+            print(f"wrote {' and '.join(matrix_paths(path))}")
+        else:
+            apply_dtypes(pd.read_csv(path)).to_parquet(columnar_path(path), index=False)
+            print(f"wrote {columnar_path(path)}")
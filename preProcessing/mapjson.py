@@ -1,32 +1,59 @@
+import argparse
 import pandas as pd
+import numpy as np
 import json
-import pycountry
-
-# Load the CSV data
-df = pd.read_csv("oxford-government-response.csv")
-
-# Calculate total measures (sum of columns for each country/date)
-df['total_measures'] = df.iloc[:, 2:-1].sum(axis=1)
-
-# Get ISO Alpha-3 code
-df['iso_a3'] = df['location_key'].astype(str).apply(lambda x: x.split('_')[0] if '_' in x else x)
-
-# Convert ISO Alpha-2 to Alpha-3
-def alpha2_to_alpha3(alpha2_code):
-    try:
-        return pycountry.countries.get(alpha_2=alpha2_code).alpha_3
-    except AttributeError:
-        return None
-
-df['iso_a3'] = df['iso_a3'].apply(alpha2_to_alpha3)
-df = df.dropna(subset=['iso_a3'])
-
-# Aggregate data by country + date
-df_country = df.groupby(['iso_a3', 'date'], as_index=False)['total_measures'].sum()
+from countries import alpha3_from_alpha2
+from datastore import write_matrix
+
+# input/output paths can be overridden, see pipeline.py
+parser = argparse.ArgumentParser()
+parser.add_argument("--input", default="oxford-government-response.csv")
+parser.add_argument("--output", default="data/government_measures.json")
+parser.add_argument("--chunksize", type=int, default=None, help="stream the CSV in chunks of this many rows")
+args = parser.parse_args()
+
+# total measures per (country, date) for a frame of the CSV
+def country_totals(df):
+    # Calculate total measures (sum of columns for each country/date)
+    df['total_measures'] = df.iloc[:, 2:-1].sum(axis=1)
+
+    # Get ISO Alpha-3 code
+    df['iso_a3'] = df['location_key'].astype(str).str.split('_').str[0]
+
+    # Convert ISO Alpha-2 to Alpha-3
+    df['iso_a3'] = alpha3_from_alpha2(df['iso_a3'])
+    df = df.dropna(subset=['iso_a3'])
+
+    # Aggregate data by country + date
+    return df.groupby(['iso_a3', 'date'])['total_measures'].sum()
+
+
+if args.chunksize:
+    # Streaming mode: only one chunk of raw rows is held at a time, plus running
+    # per-(country, date) sums. Those are bounded by countries x dates no matter
+    # how many sub-national rows the file has, so the 95th percentile below is
+    # still computed exactly from them. The sums only differ from the in-memory
+    # path by floating point summation order (relative error below 1e-12).
+    totals = None
+    for chunk in pd.read_csv(args.input, chunksize=args.chunksize):
+        chunk_totals = country_totals(chunk)
+        if totals is None:
+            totals = chunk_totals
+        else:
+            # add() goes through float for the countries/dates only one side has,
+            # cast back so integer counts are written like the in-memory path does
+            dtype = np.result_type(totals.dtype, chunk_totals.dtype)
+            totals = totals.add(chunk_totals, fill_value=0).astype(dtype)
+else:
+    # Load the CSV data
+    totals = country_totals(pd.read_csv(args.input))
+
+df_country = totals.sort_index().reset_index()
 
 # Normalize the measures (if there are non-zero values)
 df_country['normalized_measures'] = df_country['total_measures'] / df_country['total_measures'].quantile(0.95)
 df_country['normalized_measures'] = df_country['normalized_measures'].clip(upper=1)
 
-# Save data to JSON
-df_country.to_json("data/government_measures.json", orient="records")
+# Save data to JSON, plus the date x country matrix page3 loads
+df_country.to_json(args.output, orient="records")
+write_matrix(df_country, args.output)
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Runs the preprocessing scripts as one incremental pipeline.
+#
+# Each stage is fingerprinted from the contents of its input files, its script
+# (plus the shared modules it imports) and its arguments. A stage only reruns
+# when that fingerprint changes or one of its outputs is missing, and since
+# downstream stages hash the upstream outputs, an upstream rerun that produces
+# the same file stops there. Stages that don't depend on each other run at the
+# same time.
+#
+# Run from the repo root with: python preProcessing/pipeline.py
+#
+# Raw inputs are expected in the data directory with the Google COVID-19 Open
+# Data file names (vaccinations.csv, demographics.csv, economy.csv, health.csv,
+# oxford-government-response.csv). Intermediate files go to the build directory
+# and the files the pages read are written back into the data directory.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# {data} and {build} are filled in from the command line
+stages = [
+    {
+        "name": "vacprocess",
+        "script": "vacprocess.py",
+        "code": ["countries.py"],
+        "inputs": {"--input": "{data}/vaccinations.csv"},
+        "outputs": {"--output": "{build}/vaccine_stats_countries.csv"},
+    },
+    {
+        "name": "processVaccinations",
+        "script": "processVaccinations.py",
+        "code": [],
+        "inputs": {
+            "--demographics": "{data}/demographics.csv",
+            "--vaccinations": "{build}/vaccine_stats_countries.csv",
+        },
+        "outputs": {"--output": "{build}/vaccinations_with_population_indexed.csv"},
+    },
+    {
+        "name": "demoprocess",
+        "script": "demoprocess.py",
+        "code": ["countries.py"],
+        "inputs": {
+            "--demographics": "{data}/demographics.csv",
+            "--vaccinations": "{build}/vaccine_stats_countries.csv",
+            "--economy": "{data}/economy.csv",
+        },
+        "outputs": {"--output": "{build}/vaccination_gdp_final.csv"},
+    },
+    {
+        "name": "add_continent",
+        "script": "add_continent.py",
+        "code": ["countries.py", "datastore.py"],
+        "inputs": {"--input": "{build}/vaccination_gdp_final.csv"},
+        "outputs": {"--output": "{data}/vaccination_continent.csv"},
+    },
+    {
+        "name": "processHealth",
+        "script": "processHealth.py",
+        "code": ["countries.py", "datastore.py"],
+        "inputs": {"--input": "{data}/health.csv"},
+        "outputs": {"--output": "{data}/health_stats_countries_final_actual.csv"},
+    },
+    {
+        "name": "mapjson",
+        "script": "mapjson.py",
+        "code": ["countries.py", "datastore.py"],
+        "inputs": {"--input": "{data}/oxford-government-response.csv"},
+        "outputs": {"--output": "{data}/government_measures.json"},
+        # written next to --output by datastore.write_matrix
+        "side_outputs": ["{data}/government_measures.npy", "{data}/government_measures_index.json"],
+        "args": ["--chunksize", "500000"],
+    },
+]
+
+
+# fill in the directories for every stage path
+def resolve_stages(data_dir, build_dir):
+    resolved = []
+    for stage in stages:
+        stage = dict(stage)
+        stage["inputs"] = {flag: path.format(data=data_dir, build=build_dir) for flag, path in stage["inputs"].items()}
+        stage["outputs"] = {flag: path.format(data=data_dir, build=build_dir) for flag, path in stage["outputs"].items()}
+        stage["side_outputs"] = [path.format(data=data_dir, build=build_dir) for path in stage.get("side_outputs", [])]
+        resolved.append(stage)
+    return resolved
+
+
+# a stage depends on whichever stages write its inputs
+def find_dependencies(resolved):
+    producers = {
+        path: stage["name"]
+        for stage in resolved
+        for path in list(stage["outputs"].values()) + stage["side_outputs"]
+    }
+    return {
+        stage["name"]: {producers[path] for path in stage["inputs"].values() if path in producers}
+        for stage in resolved
+    }
+
+
+# sha256 of a file, reused from the state file while its size and mtime don't change
+def file_hash(path, hash_cache):
+    stat = os.stat(path)
+    cached = hash_cache.get(path)
+    if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    hash_cache[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def stage_fingerprint(stage, hash_cache):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([stage["inputs"], stage["outputs"], stage.get("args", [])], sort_keys=True).encode())
+    for name in [stage["script"]] + stage["code"]:
+        digest.update(file_hash(os.path.join(script_dir, name), hash_cache).encode())
+    for path in stage["inputs"].values():
+        digest.update(file_hash(path, hash_cache).encode())
+    return digest.hexdigest()
+
+
+def run_stage(stage):
+    command = [sys.executable, os.path.join(script_dir, stage["script"])]
+    for flag, path in list(stage["inputs"].items()) + list(stage["outputs"].items()):
+        command += [flag, path]
+    command += stage.get("args", [])
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result, time.perf_counter() - start
+
+
+def load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {"fingerprints": {}, "hashes": {}}
+
+
+def save_state(state, state_path):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def run_pipeline(data_dir="data", build_dir="data/build", force=False, jobs=4, dry_run=False):
+    os.makedirs(build_dir, exist_ok=True)
+    state_path = os.path.join(build_dir, "pipeline_state.json")
+    state = load_state(state_path)
+
+    resolved = {stage["name"]: stage for stage in resolve_stages(data_dir, build_dir)}
+    dependencies = find_dependencies(resolved.values())
+
+    done, failed, running = set(), set(), {}
+    # stages a dry run would rerun, their dependents would see new inputs so they rerun too
+    would_run = set()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(done) + len(failed) < len(resolved):
+            for name, stage in resolved.items():
+                if name in done or name in failed or name in running.values():
+                    continue
+                if dependencies[name] & failed:
+                    print(f"[skip] {name}: upstream stage failed")
+                    failed.add(name)
+                    continue
+                if not dependencies[name] <= done:
+                    continue
+
+                missing = [path for path in stage["inputs"].values() if not os.path.exists(path)]
+                if missing and not dry_run:
+                    print(f"[fail] {name}: missing input {', '.join(missing)}")
+                    failed.add(name)
+                    continue
+
+                if dry_run and dependencies[name] & would_run:
+                    print(f"[would run] {name}: upstream stage would run")
+                    would_run.add(name)
+                    done.add(name)
+                    continue
+
+                fingerprint = None if missing else stage_fingerprint(stage, state["hashes"])
+                outputs_exist = all(
+                    os.path.exists(path) for path in list(stage["outputs"].values()) + stage["side_outputs"]
+                )
+                if not force and outputs_exist and fingerprint and state["fingerprints"].get(name) == fingerprint:
+                    print(f"[up to date] {name}")
+                    done.add(name)
+                elif dry_run:
+                    print(f"[would run] {name}")
+                    would_run.add(name)
+                    done.add(name)
+                else:
+                    print(f"[run] {name}")
+                    running[executor.submit(run_stage, stage)] = name
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                result, elapsed = future.result()
+                if result.stdout.strip():
+                    print(result.stdout.rstrip())
+                if result.returncode != 0:
+                    print(f"[fail] {name} after {elapsed:.1f}s\n{result.stderr.rstrip()}")
+                    failed.add(name)
+                    continue
+                print(f"[done] {name} in {elapsed:.1f}s")
+                state["fingerprints"][name] = stage_fingerprint(resolved[name], state["hashes"])
+                done.add(name)
+
+    if not dry_run:
+        save_state(state, state_path)
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the preprocessing scripts, skipping stages whose inputs haven't changed")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--build-dir", default=os.path.join("data", "build"))
+    parser.add_argument("--force", action="store_true", help="rerun every stage")
+    parser.add_argument("--jobs", type=int, default=4, help="how many stages can run at once")
+    parser.add_argument("--dry-run", action="store_true", help="only print which stages would run")
+    args = parser.parse_args()
+
+    ok = run_pipeline(args.data_dir, args.build_dir, args.force, args.jobs, args.dry_run)
+    sys.exit(0 if ok else 1)
@@ -1,7 +1,15 @@
+import argparse
 import pandas as pd
-import pycountry
+from countries import names_from_alpha2
+from datastore import write_table
 
-df = pd.read_csv("data/health.csv", dtype=str)
+# input/output paths can be overridden, see pipeline.py
+parser = argparse.ArgumentParser()
+parser.add_argument("--input", default="data/health.csv")
+parser.add_argument("--output", default="health_stats_countries_final_actual.csv")
+args = parser.parse_args()
+
+df = pd.read_csv(args.input, dtype=str)
 
 # remove states and provinces, so only full countries
 df_clean = df[df["location_key"].notna() & df["location_key"].str.match(r"^[A-Za-z]+$")]
@@ -16,15 +24,9 @@ df_clean = df_clean.reset_index(drop=True)
 df_clean = df_clean.fillna(77777)
 
 # add country names based on the location_key (ISO 3166-1 alpha-2 codes)
-def lookup_country(code):
-    try:
-        country = pycountry.countries.get(alpha_2=code)
-        return country.name if country else None
-    except:
-        return None
-
-df_clean["country_name"] = df_clean["location_key"].apply(lookup_country)
+df_clean["country_name"] = names_from_alpha2(df_clean["location_key"])
 
 
-df_clean.to_csv("health_stats_countries_final_actual.csv", index=False)
+# write the CSV and its typed columnar copy
+write_table(df_clean, args.output)
 
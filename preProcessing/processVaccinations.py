@@ -1,8 +1,15 @@
+import argparse
 import pandas as pd
 
+# input/output paths can be overridden, see pipeline.py
+parser = argparse.ArgumentParser()
+parser.add_argument('--demographics', default='demographics_stats_countries.csv')
+parser.add_argument('--vaccinations', default='vaccine_stats_countries.csv')
+parser.add_argument('--output', default='vaccinations_with_population_indexed.csv')
+args = parser.parse_args()
 
-demographics = pd.read_csv('demographics_stats_countries.csv')
-vaccinations = pd.read_csv('vaccine_stats_countries.csv')
+demographics = pd.read_csv(args.demographics)
+vaccinations = pd.read_csv(args.vaccinations)
 
 # merge the datasets on 'location_key'
 combined = vaccinations.merge(
@@ -40,4 +47,4 @@ combined['date'] = pd.to_datetime(combined['date'], errors='coerce')
 
 combined.reset_index(drop=True, inplace=True)
 
-combined.to_csv('vaccinations_with_population_indexed.csv', index=False)
+combined.to_csv(args.output, index=False)
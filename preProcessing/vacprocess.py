@@ -1,7 +1,14 @@
+import argparse
 import pandas as pd
-import pycountry
+from countries import names_from_alpha2
 
-df = pd.read_csv("data/vaccinations.csv", dtype=str)
+# input/output paths can be overridden, see pipeline.py
+parser = argparse.ArgumentParser()
+parser.add_argument("--input", default="data/vaccinations.csv")
+parser.add_argument("--output", default="vaccine_stats_countries.csv")
+args = parser.parse_args()
+
+df = pd.read_csv(args.input, dtype=str)
 
 
 # remove any entries from location_key that contain an underscore or number
@@ -10,15 +17,7 @@ df_clean = df[df["location_key"].notna() & df["location_key"].str.match(r"^[A-Za
 # reset index afterwards
 df_clean = df_clean.reset_index(drop=True)
 
-# match country code to pycountry
-def lookup_country(code):
-    try:
-        country = pycountry.countries.get(alpha_2=code)
-        return country.name if country else None
-    except:
-        return None
-
-# apply name to country_name column based off pycountry lookup
-df_clean["country_name"] = df_clean["location_key"].apply(lookup_country)
+# apply name to country_name column based off the shared country table
+df_clean["country_name"] = names_from_alpha2(df_clean["location_key"])
 
-df_clean.to_csv("vaccine_stats_countries.csv", index=False)
\ No newline at end of file
+df_clean.to_csv(args.output, index=False)
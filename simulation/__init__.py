@@ -0,0 +1,12 @@
+from simulation.engine import (
+    HEALTHY, INFECTED, RECOVERED, VACCINATED,
+    width, height, infection_radius, duration, speed,
+    initialize_simulation, update_simulation, count_states,
+)
+from simulation.history import (
+    series, history_capacity, new_history, append_history, complete_buckets, history_points,
+)
+from simulation.sessions import (
+    max_sessions, max_total_agents, session_ttl,
+    new_session, get_session, save_session, drop_session, total_agents,
+)
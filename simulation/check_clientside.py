@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from simulation.engine import (
+    width, height, infection_radius, duration, speed,
+    initialize_simulation, update_simulation, count_states,
+)
+
+# Checks that the in-browser engine (assets/page2_simulation.js) behaves like
+# simulation/engine.py. The two use different random generators, so runs are
+# compared in aggregate: many seeded runs of each, then the mean infected curve,
+# the peak and the final attack rate have to agree within sampling error.
+#
+# Needs node. Run from the repo root with: python -m simulation.check_clientside
+# (tests/test_check_clientside.py runs the same check with the default settings)
+
+# largest allowed difference in standard errors, and largest allowed gap between
+# the mean infected curves as a share of the population
+max_z = 4.0
+max_curve_gap = 0.1
+
+js_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "page2_simulation.js")
+
+# runs every seed for steps steps in node and prints the infected/recovered curves
+node_script = """
+const engine = require(process.argv[1]);
+const options = JSON.parse(process.argv[2]);
+const runs = options.seeds.map(seed => {
+    const sim = engine.initSimulation(Object.assign({}, options.params, {seed: seed}));
+    const infected = [], recovered = [];
+    for (let step = 0; step < options.steps; step++) {
+        const counts = engine.stepSimulation(sim, options.r0);
+        infected.push(counts.infected);
+        recovered.push(counts.recovered);
+    }
+    return {infected: infected, recovered: recovered};
+});
+console.log(JSON.stringify(runs));
+"""
+
+
+def run_node(params, r0, steps, seeds):
+    options = json.dumps({"params": params, "r0": r0, "steps": steps, "seeds": seeds})
+    result = subprocess.run(["node", "-e", node_script, os.path.abspath(js_path), options],
+                            capture_output=True, text=True, check=True)
+    runs = json.loads(result.stdout)
+    return np.array([run["infected"] for run in runs]), np.array([run["recovered"] for run in runs])
+
+
+def run_python(params, r0, steps, seeds):
+    infected = np.zeros((len(seeds), steps), dtype=np.int64)
+    recovered = np.zeros((len(seeds), steps), dtype=np.int64)
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        people = initialize_simulation(params["num_people"], vaccination_percentage=params["vaccination_percentage"], rng=rng)
+        for step in range(steps):
+            update_simulation(people, r0, rng=rng)
+            counts = count_states(people)
+            infected[i, step], recovered[i, step] = counts["infected"], counts["recovered"]
+    return infected, recovered
+
+
+# difference of the means in standard errors
+def z_score(a, b):
+    error = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    return abs(a.mean() - b.mean()) / error if error else 0.0
+
+
+# run both engines on the same seeds and measure how far apart they are: a z
+# score per summary statistic and the largest gap between the mean infected
+# curves, as a share of the population
+def compare(population=300, vaccination=20, r0=2.0, steps=400, runs=60, seed=0):
+    params = {
+        "num_people": population, "vaccination_percentage": vaccination,
+        "width": width, "height": height, "infection_radius": infection_radius, "duration": duration, "speed": speed,
+    }
+    seeds = [seed + i for i in range(runs)]
+    js_infected, js_recovered = run_node(params, r0, steps, seeds)
+    py_infected, py_recovered = run_python(params, r0, steps, seeds)
+
+    susceptible = population - int(population * vaccination / 100)
+    checks = {
+        "final attack rate (z)": z_score((js_infected[:, -1] + js_recovered[:, -1]) / susceptible,
+                                         (py_infected[:, -1] + py_recovered[:, -1]) / susceptible),
+        "peak infected (z)": z_score(js_infected.max(axis=1), py_infected.max(axis=1)),
+        "time to peak (z)": z_score(js_infected.argmax(axis=1), py_infected.argmax(axis=1)),
+    }
+    curve_gap = np.abs(js_infected.mean(axis=0) - py_infected.mean(axis=0)).max() / population
+    peaks = js_infected.max(axis=1).mean(), py_infected.max(axis=1).mean()
+    return checks, curve_gap, peaks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the in-browser page2 engine with the Python one")
+    parser.add_argument("--runs", type=int, default=60, help="seeded runs per engine")
+    parser.add_argument("--steps", type=int, default=400)
+    parser.add_argument("--population", type=int, default=300)
+    parser.add_argument("--vaccination", type=int, default=20)
+    parser.add_argument("--r0", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-z", type=float, default=max_z, help="largest allowed difference in standard errors")
+    parser.add_argument("--max-curve-gap", type=float, default=max_curve_gap,
+                        help="largest allowed gap between the mean infected curves, as a share of the population")
+    args = parser.parse_args()
+
+    checks, curve_gap, (js_peak, py_peak) = compare(
+        args.population, args.vaccination, args.r0, args.steps, args.runs, args.seed
+    )
+
+    ok = True
+    for name, z in checks.items():
+        passed = z <= args.max_z
+        ok &= passed
+        print(f"{name:<24} {z:6.2f}  {'ok' if passed else 'FAIL'}")
+    passed = curve_gap <= args.max_curve_gap
+    ok &= passed
+    print(f"{'mean infected curve gap':<24} {curve_gap:6.3f}  {'ok' if passed else 'FAIL'}")
+    print(f"browser peak {js_peak:.1f}, python peak {py_peak:.1f}")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,75 @@
+import numpy as np
+
+from simulation.engine import duration
+
+# Compartmental (SIR / SEIR) version of the page2 model for populations too
+# big for the agent simulation.
+#
+# It takes the same parameters as page2: R0, vaccination percentage and how
+# many steps someone stays infected (duration). The vaccinated are removed up
+# front and one person starts infected, like initialize_simulation. With an
+# incubation period it becomes SEIR. The ODEs are integrated with fixed-step
+# RK4, one time unit per agent simulation step. All inputs broadcast against
+# each other, so a whole grid of parameter combinations is solved at once.
+
+# RK4 is accurate to well under one person at steps of a few time units
+# (durations are ~150), and bigger steps make a solve proportionally faster
+time_step = 5.0
+max_steps = 2000
+
+
+# d/dt of the (susceptible, exposed, infected, recovered) rows of y
+def _derivatives(y, beta, sigma, gamma, population):
+    infections = beta * y[0] * y[2] / population
+    recoveries = gamma * y[2]
+    dy = np.empty_like(y)
+    dy[0] = -infections
+    dy[3] = recoveries
+    if sigma is None:
+        dy[1] = 0
+        dy[2] = infections - recoveries
+    else:
+        onsets = sigma * y[1]
+        dy[1] = infections - onsets
+        dy[2] = onsets - recoveries
+    return dy
+
+
+# returns {"step": (T,), "susceptible"/"exposed"/"infected"/"recovered"/"vaccinated": (batch, T)}
+# where batch is the size of the broadcast inputs (flattened) and the solve
+# stops once fewer than half a person is still infected or exposed anywhere
+def solve_compartmental(r0, vaccination_percentage=0, population=1000, duration=duration, incubation=0,
+                        dt=time_step, max_steps=max_steps):
+    r0, vaccination_percentage, population, duration = (
+        np.asarray(values, dtype=np.float64).ravel()
+        for values in np.broadcast_arrays(r0, vaccination_percentage, population, duration)
+    )
+    gamma = 1 / duration
+    beta = r0 * gamma
+    sigma = None if not incubation else 1 / incubation
+
+    vaccinated = np.floor(population * vaccination_percentage / 100)
+    y = np.zeros((4, len(r0)))
+    y[2] = np.minimum(1.0, population - vaccinated)
+    y[0] = population - vaccinated - y[2]
+
+    steps = [y]
+    for _ in range(max_steps):
+        k1 = _derivatives(y, beta, sigma, gamma, population)
+        k2 = _derivatives(y + dt / 2 * k1, beta, sigma, gamma, population)
+        k3 = _derivatives(y + dt / 2 * k2, beta, sigma, gamma, population)
+        k4 = _derivatives(y + dt * k3, beta, sigma, gamma, population)
+        y = y + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        steps.append(y)
+        if (y[1] + y[2]).max() < 0.5:
+            break
+
+    solution = np.stack(steps, axis=2)  # (compartment, batch, time)
+    return {
+        "step": np.arange(solution.shape[2]) * dt,
+        "susceptible": solution[0],
+        "exposed": solution[1],
+        "infected": solution[2],
+        "recovered": solution[3],
+        "vaccinated": np.repeat(vaccinated[:, None], solution.shape[2], axis=1),
+    }
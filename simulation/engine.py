@@ -0,0 +1,134 @@
+import numpy as np
+
+# Vectorized version of the R0 agent simulation from pages/page2.py.
+#
+# Agents are stored as a struct of arrays: a dict of equal-length numpy arrays
+# (x, y, vx, vy, state, time_infected) so a step is a handful of array
+# operations instead of a Python loop over dicts.
+
+# some constants for the simulation setup
+width, height = 300, 300
+infection_radius = 8
+duration = 150  # how long someone stays infected before recovering
+speed = 2
+
+# agent states, one uint8 per person
+HEALTHY, INFECTED, RECOVERED, VACCINATED = 0, 1, 2, 3
+
+# shared generator, used when a caller doesn't pass its own rng
+shared_rng = np.random.default_rng()
+
+
+# set up everyone at the start of the simulation
+def initialize_simulation(num_people, infected_count=1, vaccination_percentage=0, rng=None):
+    rng = shared_rng if rng is None else rng
+    state = np.full(num_people, HEALTHY, dtype=np.uint8)
+
+    # the first vaccination_percentage% are vaccinated, the next few are infected
+    vaccinated_count = int(num_people * (vaccination_percentage / 100))
+    state[:vaccinated_count] = VACCINATED
+    state[vaccinated_count:vaccinated_count + infected_count] = INFECTED
+
+    # float32 is plenty for positions on a 300x300 grid and halves the memory
+    # each session's simulation holds on to
+    return {
+        "x": rng.uniform(0, width, num_people).astype(np.float32),  # random starting position
+        "y": rng.uniform(0, height, num_people).astype(np.float32),
+        "vx": rng.uniform(-1, 1, num_people).astype(np.float32),  # random direction/speed
+        "vy": rng.uniform(-1, 1, num_people).astype(np.float32),
+        "state": state,
+        "time_infected": np.zeros(num_people, dtype=np.int32),  # how long someone has been infected
+    }
+
+
+# all (source, target) pairs closer than radius, found through a grid of
+# radius-sized cells so only the 9 cells around each source are checked.
+# Yields one batch of pairs per neighbouring cell offset to keep memory down.
+def contact_pairs(source_x, source_y, target_x, target_y, radius):
+    cells_x = int(width // radius) + 1
+    cells_y = int(height // radius) + 1
+
+    # people can be slightly outside the walls before they bounce back, clipping
+    # them into the edge cells keeps anyone within radius in a neighbouring cell
+    def cell_of(x, y):
+        cell_x = np.clip((x // radius).astype(np.int64), 0, cells_x - 1)
+        cell_y = np.clip((y // radius).astype(np.int64), 0, cells_y - 1)
+        return cell_x, cell_y
+
+    # targets sorted by cell, with where each cell's run starts
+    target_cell_x, target_cell_y = cell_of(target_x, target_y)
+    target_cell = target_cell_x * cells_y + target_cell_y
+    order = np.argsort(target_cell, kind="stable")
+    counts = np.bincount(target_cell, minlength=cells_x * cells_y)
+    starts = np.cumsum(counts) - counts
+
+    source_cell_x, source_cell_y = cell_of(source_x, source_y)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbour_x = source_cell_x + dx
+            neighbour_y = source_cell_y + dy
+            valid = (neighbour_x >= 0) & (neighbour_x < cells_x) & (neighbour_y >= 0) & (neighbour_y < cells_y)
+            sources = np.nonzero(valid)[0]
+            neighbour_cell = neighbour_x[valid] * cells_y + neighbour_y[valid]
+
+            # expand every source into one pair per target in that cell
+            pair_counts = counts[neighbour_cell]
+            total = int(pair_counts.sum())
+            if total == 0:
+                continue
+            pair_source = np.repeat(sources, pair_counts)
+            run_offset = np.arange(total) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+            pair_target = order[np.repeat(starts[neighbour_cell], pair_counts) + run_offset]
+
+            distance_sq = (source_x[pair_source] - target_x[pair_target]) ** 2 + (source_y[pair_source] - target_y[pair_target]) ** 2
+            close = distance_sq < radius ** 2
+            yield pair_source[close], pair_target[close]
+
+
+# move each person and bounce off the walls if they hit the edges, in place.
+# Works on any slice of the arrays, see simulation/parallel.py
+def move_people(people):
+    x, y, vx, vy = people["x"], people["y"], people["vx"], people["vy"]
+    x += vx * speed
+    y += vy * speed
+    vx[(x < 0) | (x > width)] *= -1
+    vy[(y < 0) | (y > height)] *= -1
+
+
+# check if infected people have recovered, in place
+def recover_people(people, duration=duration):
+    state, time_infected = people["state"], people["time_infected"]
+    infected = state == INFECTED
+    time_infected[infected] += 1
+    state[infected & (time_infected > duration)] = RECOVERED
+
+
+# update positions and spread infection for one tick, in place
+def update_simulation(people, R0, infection_radius=infection_radius, duration=duration, rng=None):
+    rng = shared_rng if rng is None else rng
+    x, y, state = people["x"], people["y"], people["state"]
+
+    move_people(people)
+    recover_people(people, duration)
+
+    # everyone infected at this point gets a chance (R0 / 10) to infect each
+    # healthy person within infection_radius of their new position
+    sources = np.nonzero(state == INFECTED)[0]
+    targets = np.nonzero(state == HEALTHY)[0]
+    if len(sources) and len(targets):
+        for pair_source, pair_target in contact_pairs(x[sources], y[sources], x[targets], y[targets], infection_radius):
+            hit = rng.random(len(pair_target)) < R0 / 10
+            state[targets[pair_target[hit]]] = INFECTED
+
+    return people
+
+
+# how many people are in each group
+def count_states(people):
+    counts = np.bincount(people["state"], minlength=4)
+    return {
+        "healthy": int(counts[HEALTHY]),
+        "infected": int(counts[INFECTED]),
+        "recovered": int(counts[RECOVERED]),
+        "vaccinated": int(counts[VACCINATED]),
+    }
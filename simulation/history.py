@@ -0,0 +1,98 @@
+import numpy as np
+
+# Fixed-size history of the infected / recovered / vaccinated counts.
+#
+# The counts go into capacity buckets of width steps each, and every bucket
+# keeps the lowest and highest value of each series and the step it happened
+# at. When all buckets are used, neighbouring pairs are merged and the width
+# doubles. A run of any length therefore takes the same memory and plots as
+# at most 2 * capacity points per series, and the peak of the infected curve
+# is always one of them.
+
+series = ("infected", "recovered", "vaccinated")
+
+history_capacity = 1000
+
+
+def new_history(capacity=history_capacity):
+    capacity += capacity % 2  # merging works on pairs
+    return {
+        "capacity": capacity,
+        "width": 1,  # steps per bucket
+        "size": 0,  # buckets in use, the last one may still be filling up
+        "first_step": np.zeros(capacity, dtype=np.int64),
+        "samples": np.zeros(capacity, dtype=np.int32),
+        "low": np.zeros((capacity, len(series)), dtype=np.int32),
+        "high": np.zeros((capacity, len(series)), dtype=np.int32),
+        "low_step": np.zeros((capacity, len(series)), dtype=np.int64),
+        "high_step": np.zeros((capacity, len(series)), dtype=np.int64),
+    }
+
+
+# merge neighbouring buckets, keeping the lowest/highest value of each pair
+def _merge_pairs(history):
+    half = history["capacity"] // 2
+    for extreme, pick_second in (("low", np.less), ("high", np.greater)):
+        values, steps = history[extreme], history[extreme + "_step"]
+        first, second = values[0::2], values[1::2]
+        second_wins = pick_second(second, first)
+        merged_values = np.where(second_wins, second, first)
+        merged_steps = np.where(second_wins, steps[1::2], steps[0::2])
+        values[:half], steps[:half] = merged_values, merged_steps
+
+    history["first_step"][:half] = history["first_step"][0::2]
+    history["samples"][:half] = history["samples"][0::2] + history["samples"][1::2]
+    history["size"] = half
+    history["width"] *= 2
+
+
+# add one step's counts; returns True if the buckets were merged to make room
+def append_history(history, step, counts):
+    values = [counts[name] for name in series]
+    last = history["size"] - 1
+    if last >= 0 and history["samples"][last] < history["width"]:
+        low, high = history["low"][last], history["high"][last]
+        for j, value in enumerate(values):
+            if value < low[j]:
+                low[j], history["low_step"][last, j] = value, step
+            if value > high[j]:
+                high[j], history["high_step"][last, j] = value, step
+        history["samples"][last] += 1
+        return False
+
+    merged = history["size"] == history["capacity"]
+    if merged:
+        _merge_pairs(history)
+
+    i = history["size"]
+    history["first_step"][i] = step
+    history["samples"][i] = 1
+    history["low"][i] = history["high"][i] = values
+    history["low_step"][i] = history["high_step"][i] = step
+    history["size"] += 1
+    return merged
+
+
+# how many buckets are complete, only those are plotted
+def complete_buckets(history):
+    size = history["size"]
+    if size and history["samples"][size - 1] < history["width"]:
+        return size - 1
+    return size
+
+
+# {series: (steps, values)} for buckets start..end, the low and high point of
+# each bucket in the order they happened (once if they're the same step)
+def history_points(history, start=0, end=None):
+    end = complete_buckets(history) if end is None else end
+    points = {}
+    for j, name in enumerate(series):
+        low, high = history["low"][start:end, j], history["high"][start:end, j]
+        low_step, high_step = history["low_step"][start:end, j], history["high_step"][start:end, j]
+        low_first = low_step <= high_step
+
+        steps = np.column_stack([np.where(low_first, low_step, high_step), np.where(low_first, high_step, low_step)])
+        values = np.column_stack([np.where(low_first, low, high), np.where(low_first, high, low)])
+        keep = np.column_stack([np.ones(len(steps), dtype=bool), steps[:, 1] != steps[:, 0]])
+        points[name] = (steps[keep].tolist(), values[keep].tolist())
+    return points
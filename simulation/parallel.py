@@ -0,0 +1,260 @@
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from simulation.engine import (
+    HEALTHY, INFECTED, width, height, infection_radius, duration,
+    initialize_simulation, update_simulation, count_states,
+    move_people, recover_people, contact_pairs,
+)
+
+# Multi-process version of update_simulation for offline runs with millions of
+# agents.
+#
+# The world is split into a 2D grid of tiles, at most one per worker and each
+# at least infection_radius wide. The agent arrays live in shared memory and
+# every worker steps them in four phases with a barrier in between:
+#   1. move and recover its own range of agent indexes, work out which tile
+#      each of them is in now and count them per tile
+#   2. write its indexes into the shared order array, grouped by tile (a
+#      counting sort split over the workers), so every tile's agents are one
+#      contiguous run of order
+#   3. infection for its own tiles: the healthy people in the tile are the
+#      targets, the infected people in the tile plus a halo of
+#      infection_radius read from the 8 neighbouring tiles are the sources.
+#      New infections are only flagged here, so no worker sees another one's
+#      writes mid-step
+#   4. apply the flags and count states for its index range again
+# Every phase only touches the worker's own ~N/K agents (plus the halo), so
+# adding workers shrinks the work each one does. A tile only writes flags for
+# its own targets, so the workers never write the same element. Every worker
+# has its own random stream spawned from one seed, which makes runs
+# statistically equivalent to the single-process engine but not identical to it.
+#
+# Run from the repo root with: python -m simulation.parallel --agents 1000000
+
+# name -> dtype of the shared per-agent arrays
+agent_arrays = {
+    "x": np.float32, "y": np.float32, "vx": np.float32, "vy": np.float32,
+    "state": np.uint8, "time_infected": np.int32,
+    "newly_infected": np.uint8,  # phase 3 flags
+    "tile": np.int16,  # phase 1, which tile each agent is in (small ints sort in linear time)
+    "order": np.int64,  # phase 2, agent indexes grouped by tile
+}
+
+
+# (columns, rows) of tiles for this many workers, as square as the worker count
+# allows and never narrower than radius, so the halo only reaches one tile over
+def tile_grid(workers, radius):
+    columns = next(c for c in range(int(np.ceil(np.sqrt(workers))), workers + 1) if workers % c == 0)
+    rows = workers // columns
+    return max(1, min(columns, int(width // radius))), max(1, min(rows, int(height // radius)))
+
+
+def _attach(blocks, num_people, max_steps, workers, tiles):
+    people = {
+        name: np.ndarray(num_people, dtype=dtype, buffer=blocks[name].buf)
+        for name, dtype in agent_arrays.items()
+    }
+    counts = np.ndarray((max_steps, workers, 4), dtype=np.int64, buffer=blocks["counts"].buf)
+    tile_counts = np.ndarray((workers, tiles), dtype=np.int64, buffer=blocks["tile_counts"].buf)
+    return people, counts, tile_counts
+
+
+def _worker(worker, workers, block_names, num_people, R0, radius, duration, max_steps, seed, barrier):
+    columns, rows = tile_grid(workers, radius)
+    tiles = columns * rows
+    blocks = {name: shared_memory.SharedMemory(name=block_name) for name, block_name in block_names.items()}
+    try:
+        people, counts, tile_counts = _attach(blocks, num_people, max_steps, workers, tiles)
+        rng = np.random.default_rng(seed)
+
+        own = slice(worker * num_people // workers, (worker + 1) * num_people // workers)
+        own_people = {name: array[own] for name, array in people.items()}
+        own_count = own.stop - own.start
+
+        # bounds of this worker's tiles and who their neighbours are, the
+        # outer tiles also take anyone who is slightly outside the walls
+        tile_width, tile_height = width / columns, height / rows
+        my_tiles = []
+        for tile in range(worker, tiles, workers):
+            column, row = divmod(tile, rows)
+            low_x = -np.inf if column == 0 else column * tile_width
+            high_x = np.inf if column == columns - 1 else (column + 1) * tile_width
+            low_y = -np.inf if row == 0 else row * tile_height
+            high_y = np.inf if row == rows - 1 else (row + 1) * tile_height
+            neighbours = [
+                (column + dx) * rows + row + dy
+                for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                if (dx or dy) and 0 <= column + dx < columns and 0 <= row + dy < rows
+            ]
+            my_tiles.append((tile, neighbours, low_x - radius, high_x + radius, low_y - radius, high_y + radius))
+
+        x, y, state = people["x"], people["y"], people["state"]
+        newly_infected, order = people["newly_infected"], people["order"]
+        for step in range(max_steps):
+            move_people(own_people)
+            recover_people(own_people, duration)
+            # multiply and truncate rather than floor divide, it's several
+            # times faster and anyone below 0 is clipped into the first tile anyway
+            column = np.clip((own_people["x"] * (1 / tile_width)).astype(np.int16), 0, columns - 1)
+            row = np.clip((own_people["y"] * (1 / tile_height)).astype(np.int16), 0, rows - 1)
+            np.add(column * rows, row, out=own_people["tile"])
+            tile_counts[worker] = np.bincount(own_people["tile"], minlength=tiles)
+            barrier.wait()
+
+            # where each (tile, worker) run starts in order: tile by tile, and
+            # within a tile worker by worker
+            runs = tile_counts.T.ravel()
+            run_starts = (np.cumsum(runs) - runs).reshape(tiles, workers)
+            tile_starts = run_starts[:, 0]
+            tile_ends = tile_starts + tile_counts.sum(axis=0)
+
+            mine = tile_counts[worker]
+            by_tile = np.argsort(own_people["tile"], kind="stable")
+            position = np.repeat(run_starts[:, worker], mine) + np.arange(own_count) - np.repeat(np.cumsum(mine) - mine, mine)
+            order[position] = own.start + by_tile
+            barrier.wait()
+
+            for tile, neighbours, low_x, high_x, low_y, high_y in my_tiles:
+                members = order[tile_starts[tile]:tile_ends[tile]]
+                targets = members[state[members] == HEALTHY]
+                if not len(targets):
+                    continue
+                halo = np.concatenate([order[tile_starts[n]:tile_ends[n]] for n in neighbours] or [members[:0]])
+                halo = halo[state[halo] == INFECTED]
+                halo = halo[(x[halo] >= low_x) & (x[halo] < high_x) & (y[halo] >= low_y) & (y[halo] < high_y)]
+                sources = np.concatenate([members[state[members] == INFECTED], halo])
+                if not len(sources):
+                    continue
+                for pair_source, pair_target in contact_pairs(x[sources], y[sources], x[targets], y[targets], radius):
+                    hit = rng.random(len(pair_target)) < R0 / 10
+                    newly_infected[targets[pair_target[hit]]] = 1
+            barrier.wait()
+
+            flagged = own_people["newly_infected"] == 1
+            own_people["state"][flagged] = INFECTED
+            own_people["newly_infected"][flagged] = 0
+            counts[step, worker] = np.bincount(own_people["state"], minlength=4)
+            barrier.wait()
+
+            # every worker sees the same counts, so they all stop together
+            if counts[step, :, INFECTED].sum() == 0:
+                break
+    except threading.BrokenBarrierError:
+        # another worker failed and aborted the barrier, its own error says why
+        raise SystemExit(1)
+    except BaseException:
+        # let the other workers out of barrier.wait() instead of leaving them
+        # waiting for this one forever
+        barrier.abort()
+        raise
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+# run until nobody is infected or max_steps, returns a (steps, 4) array of
+# state counts per step (columns HEALTHY, INFECTED, RECOVERED, VACCINATED)
+def run_parallel(num_people, R0, max_steps, workers=None, seed=None, infected_count=1, vaccination_percentage=0,
+                 infection_radius=infection_radius, duration=duration):
+    workers = workers or os.cpu_count() or 1
+    columns, rows = tile_grid(workers, infection_radius)
+    init_seed, *worker_seeds = np.random.SeedSequence(seed).spawn(workers + 1)
+    people = initialize_simulation(num_people, infected_count, vaccination_percentage, rng=np.random.default_rng(init_seed))
+
+    sizes = {name: num_people * np.dtype(dtype).itemsize for name, dtype in agent_arrays.items()}
+    sizes["counts"] = max_steps * workers * 4 * np.dtype(np.int64).itemsize
+    sizes["tile_counts"] = workers * columns * rows * np.dtype(np.int64).itemsize
+    blocks = {name: shared_memory.SharedMemory(create=True, size=max(size, 1)) for name, size in sizes.items()}
+    try:
+        shared_people, counts, tile_counts = _attach(blocks, num_people, max_steps, workers, columns * rows)
+        for name, array in people.items():
+            shared_people[name][:] = array
+        shared_people["newly_infected"][:] = 0
+        counts[:] = -1
+        del people
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(workers)
+        processes = [
+            context.Process(target=_worker, args=(
+                worker, workers, {name: block.name for name, block in blocks.items()},
+                num_people, R0, infection_radius, duration, max_steps, worker_seeds[worker], barrier,
+            ))
+            for worker in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # a worker that dies without raising (killed for memory, say) can't
+        # abort the barrier itself, so that's done here as soon as one fails
+        running = list(processes)
+        while running:
+            wait([process.sentinel for process in running])
+            running = [process for process in running if process.is_alive()]
+            if any(process.exitcode not in (None, 0) for process in processes):
+                barrier.abort()
+        for process in processes:
+            process.join()
+        if any(process.exitcode != 0 for process in processes):
+            raise RuntimeError("a simulation worker failed")
+
+        steps_run = int((counts[:, 0, 0] >= 0).sum())
+        result = counts[:steps_run].sum(axis=1)
+        del shared_people, counts, tile_counts
+        return result
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+# the same run on the single-process engine, for comparison
+def run_single(num_people, R0, max_steps, seed=None, infected_count=1, vaccination_percentage=0,
+               infection_radius=infection_radius, duration=duration):
+    rng = np.random.default_rng(seed)
+    people = initialize_simulation(num_people, infected_count, vaccination_percentage, rng=rng)
+    history = []
+    for _ in range(max_steps):
+        update_simulation(people, R0, infection_radius, duration, rng=rng)
+        counts = count_states(people)
+        history.append([counts["healthy"], counts["infected"], counts["recovered"], counts["vaccinated"]])
+        if counts["infected"] == 0:
+            break
+    return np.array(history)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the R0 simulation on several processes over shared memory")
+    parser.add_argument("--agents", type=int, default=1_000_000)
+    parser.add_argument("--r0", type=float, default=2.0)
+    parser.add_argument("--steps", type=int, default=200, help="maximum number of steps")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--infected-share", type=float, default=0.001, help="share of agents infected at the start")
+    parser.add_argument("--vaccination", type=int, default=0)
+    parser.add_argument("--radius", type=float, default=infection_radius)
+    parser.add_argument("--compare-single", action="store_true", help="also run the single-process engine")
+    args = parser.parse_args()
+
+    infected_count = max(1, int(args.agents * args.infected_share))
+    runs = [("parallel", lambda: run_parallel(args.agents, args.r0, args.steps, args.workers, args.seed,
+                                              infected_count, args.vaccination, args.radius))]
+    if args.compare_single:
+        runs.append(("single", lambda: run_single(args.agents, args.r0, args.steps, args.seed,
+                                                  infected_count, args.vaccination, args.radius)))
+
+    for name, run in runs:
+        start = time.perf_counter()
+        counts = run()
+        elapsed = time.perf_counter() - start
+        healthy, infected, recovered, vaccinated = counts[-1]
+        print(f"{name:>8}: {len(counts)} steps in {elapsed:.1f}s ({len(counts) / elapsed:.1f} steps/s), "
+              f"peak infected {counts[:, 1].max():,}, final healthy {healthy:,} infected {infected:,} "
+              f"recovered {recovered:,} vaccinated {vaccinated:,}")
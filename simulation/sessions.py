@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from simulation.engine import initialize_simulation
+from simulation.history import new_history
+
+# Per-browser simulation state for page2.
+#
+# Each browser tab gets a session id (a uuid kept in a dcc.Store) and its own
+# simulation, so viewers don't step each other's agents. Sessions are kept in
+# least recently used order and dropped when they haven't been touched for
+# session_ttl seconds, when there are more than max_sessions, or when all of
+# them together hold more than max_total_agents people.
+
+max_sessions = 500
+max_total_agents = 1_000_000
+session_ttl = 15 * 60  # seconds
+
+# session id -> session dict, least recently used first
+sessions = OrderedDict()
+sessions_lock = threading.Lock()
+
+
+def session_agents(session):
+    return len(session["people"]["state"])
+
+
+def total_agents():
+    with sessions_lock:
+        return sum(session_agents(session) for session in sessions.values())
+
+
+# a fresh simulation plus the bookkeeping page2 needs to notice restarts. Each
+# session has its own generator, so runs can be replayed from their seed and
+# sessions stepped on different threads never share one
+def new_session(num_people, vaccination_percentage=0, restart_clicks=0, seed=None):
+    rng = np.random.default_rng(seed)
+    return {
+        "seed": seed,
+        "people": initialize_simulation(num_people, vaccination_percentage=vaccination_percentage, rng=rng),
+        "rng": rng,
+        "history": new_history(),
+        "sent_buckets": 0,  # history buckets the page already has, see page2
+        "num_people": num_people,
+        "last_restart_clicks": restart_clicks,
+        "step": 0,
+        "last_n_intervals": 0,  # last interval tick handled, to notice when the browser falls behind
+        "view_id": None,  # which page view has the full figures, see page2
+        "last_seen": time.monotonic(),
+        # one tick at a time per session, the interval and the restart button can overlap
+        "lock": threading.Lock(),
+    }
+
+
+# drop expired sessions, then the least recently used ones until we're under the caps
+def _evict(now):
+    expired = [session_id for session_id, session in sessions.items() if now - session["last_seen"] > session_ttl]
+    for session_id in expired:
+        del sessions[session_id]
+
+    agents = sum(session_agents(session) for session in sessions.values())
+    while len(sessions) > max_sessions or (agents > max_total_agents and len(sessions) > 1):
+        _, session = sessions.popitem(last=False)
+        agents -= session_agents(session)
+
+
+# the session for session_id, or None if it was never created or has been evicted
+def get_session(session_id):
+    now = time.monotonic()
+    with sessions_lock:
+        _evict(now)
+        session = sessions.get(session_id)
+        if session is not None:
+            session["last_seen"] = now
+            sessions.move_to_end(session_id)
+        return session
+
+
+def save_session(session_id, session):
+    now = time.monotonic()
+    with sessions_lock:
+        session["last_seen"] = now
+        sessions[session_id] = session
+        sessions.move_to_end(session_id)
+        _evict(now)
+
+
+def drop_session(session_id):
+    with sessions_lock:
+        sessions.pop(session_id, None)
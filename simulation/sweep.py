@@ -0,0 +1,121 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from simulation.engine import initialize_simulation, update_simulation, count_states
+
+# Headless Monte Carlo runs of the page2 simulation over a grid of R0,
+# vaccination percentage and population size.
+#
+# Every replicate gets its own random stream spawned from one seed, so a sweep
+# is reproducible no matter how the runs are spread over the process pool. A
+# run stops as soon as no one is infected any more. Per grid point we keep the
+# distribution of the final attack rate and the mean peak / time to peak, and
+# page2 plots them.
+#
+# Run from the repo root with: python -m simulation.sweep
+
+sweep_path = os.path.join("data", "simulation_sweep.csv")
+
+r0_values = [round(r0, 2) for r0 in np.arange(0.5, 3.01, 0.25)]
+vaccination_values = list(range(0, 91, 10))
+population_values = [100, 500, 1000]
+
+max_steps = 3000
+
+
+# one run until the infection dies out (or max_steps), returns what the sweep records
+def run_replicate(num_people, r0, vaccination_percentage, seed, max_steps=max_steps):
+    rng = np.random.default_rng(seed)
+    people = initialize_simulation(num_people, vaccination_percentage=vaccination_percentage, rng=rng)
+    counts = count_states(people)
+
+    peak_infected, time_to_peak, step = counts["infected"], 0, 0
+    while counts["infected"] and step < max_steps:
+        update_simulation(people, r0, rng=rng)
+        step += 1
+        counts = count_states(people)
+        if counts["infected"] > peak_infected:
+            peak_infected, time_to_peak = counts["infected"], step
+
+    # share of the people who could catch it that did
+    susceptible = num_people - counts["vaccinated"]
+    ever_infected = counts["infected"] + counts["recovered"]
+    return {
+        "population": num_people,
+        "r0": r0,
+        "vaccination_percentage": vaccination_percentage,
+        "attack_rate": ever_infected / susceptible if susceptible else 0.0,
+        "peak_infected": peak_infected,
+        "time_to_peak": time_to_peak,
+        "steps": step,
+    }
+
+
+def _run_task(task):
+    return run_replicate(*task)
+
+
+# every replicate of every grid point, one row per run
+def run_sweep(r0_values=r0_values, vaccination_values=vaccination_values, population_values=population_values,
+              replicates=20, seed=0, jobs=None, max_steps=max_steps):
+    grid = list(itertools.product(population_values, r0_values, vaccination_values))
+    seeds = np.random.SeedSequence(seed).spawn(len(grid) * replicates)
+    tasks = [
+        (population, r0, vaccination, seeds[i * replicates + replicate], max_steps)
+        for i, (population, r0, vaccination) in enumerate(grid)
+        for replicate in range(replicates)
+    ]
+
+    # the bigger populations take longest, hand them out first
+    tasks.sort(key=lambda task: -task[0])
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        rows = list(executor.map(_run_task, tasks, chunksize=max(1, len(tasks) // (8 * (jobs or os.cpu_count() or 1)))))
+    return pd.DataFrame(rows)
+
+
+# outbreak size distribution and peak timing per grid point
+def summarize(runs):
+    grouped = runs.groupby(["population", "r0", "vaccination_percentage"])
+    summary = grouped.agg(
+        replicates=("attack_rate", "size"),
+        attack_rate_mean=("attack_rate", "mean"),
+        attack_rate_p10=("attack_rate", lambda values: values.quantile(0.1)),
+        attack_rate_median=("attack_rate", "median"),
+        attack_rate_p90=("attack_rate", lambda values: values.quantile(0.9)),
+        peak_infected_mean=("peak_infected", "mean"),
+        time_to_peak_mean=("time_to_peak", "mean"),
+        steps_mean=("steps", "mean"),
+    )
+    return summary.reset_index()
+
+
+if __name__ == "__main__":
+    from preProcessing.datastore import write_table
+
+    parser = argparse.ArgumentParser(description="Run seeded replicates of the R0 simulation over a parameter grid")
+    parser.add_argument("--r0", type=float, nargs="+", default=r0_values)
+    parser.add_argument("--vaccination", type=int, nargs="+", default=vaccination_values)
+    parser.add_argument("--population", type=int, nargs="+", default=population_values)
+    parser.add_argument("--replicates", type=int, default=20, help="runs per grid point")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument("--max-steps", type=int, default=max_steps)
+    parser.add_argument("--output", default=sweep_path)
+    parser.add_argument("--runs-output", help="also write every single run here")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    runs = run_sweep(args.r0, args.vaccination, args.population, args.replicates, args.seed, args.jobs, args.max_steps)
+    print(f"{len(runs)} runs in {time.perf_counter() - start:.1f}s")
+
+    write_table(summarize(runs), args.output)
+    print(f"wrote {args.output}")
+    if args.runs_output:
+        write_table(runs, args.runs_output)
+        print(f"wrote {args.runs_output}")
@@ -0,0 +1,15 @@
+import shutil
+
+import pytest
+
+from simulation import check_clientside
+
+
+# the browser engine (assets/page2_simulation.js) has to match simulation/engine.py
+# in aggregate, with the thresholds and fixed seeds python -m simulation.check_clientside uses
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node to run the browser engine")
+def test_browser_engine_matches_python_engine():
+    checks, curve_gap, _ = check_clientside.compare(seed=0)
+    for name, z in checks.items():
+        assert z <= check_clientside.max_z, f"{name}: {z:.2f}"
+    assert curve_gap <= check_clientside.max_curve_gap